@@ -7,8 +7,8 @@ from config.logger import logger
 
 
 class AnkiFileManager:
-    def __init__(self, ANKI_CONNECT_URL) -> None:
-        self.invoker = AnkiInvoker(ANKI_CONNECT_URL)
+    def __init__(self, ANKI_CONNECT_URL, session=None, breaker=None) -> None:
+        self.invoker = AnkiInvoker(ANKI_CONNECT_URL, session, breaker)
         pass
 
     def get_media_files(self):
@@ -28,14 +28,19 @@ class AnkiFileManager:
             return match.group(1)
         return None
 
-    def store_media_file(self, filename, url):
+    def store_media_file(self, filename, url=None, path=None):
+        """Store a media file in Anki, from a URL or from a local path."""
+        source = path or url
         logger.info(
-            f"AnkiFileManager: Attempting to retrieve media file {url} as {filename}"
+            f"AnkiFileManager: Attempting to retrieve media file {source} as {filename}"
         )
+        params = {"filename": filename}
+        if path:
+            params["path"] = path
+        else:
+            params["url"] = url
         try:
-            store_response = self.invoker.invoke(
-                "storeMediaFile", {"filename": filename, "url": url}
-            )
+            store_response = self.invoker.invoke("storeMediaFile", params)
             if "error" in store_response and store_response["error"]:
                 logger.error(
                     f"Error storing media file '{filename}': {store_response['error']}"
@@ -46,3 +51,54 @@ class AnkiFileManager:
             return stored_filename
         except Exception as e:
             logger.exception("Exception trying to store files")
+
+    def retrieve_media_file(self, filename):
+        """
+        Returns:
+            str: The base64-encoded contents of a file in Anki's media folder,
+            or None if it can't be read.
+        """
+        response = self.invoker.invoke("retrieveMediaFile", {"filename": filename})
+        if response.get("error") or not response.get("result"):
+            logger.error(f"Could not retrieve media file '{filename}'.")
+            return None
+        return response["result"]
+
+    def copy_media_file(self, source, filename):
+        """
+        Store a copy of a file that is already in Anki's media folder under
+        another name, without downloading it again.
+
+        Returns:
+            str: The stored filename, or None on failure.
+        """
+        data = self.retrieve_media_file(source)
+        if data is None:
+            return None
+        response = self.invoker.invoke(
+            "storeMediaFile", {"filename": filename, "data": data}
+        )
+        if response.get("error"):
+            logger.error(f"Error storing media file '{filename}': {response['error']}")
+            return None
+        logger.info(f"Copied media file '{source}' to '{response.get('result')}'.")
+        return response.get("result")
+
+    def get_media_file_names(self, pattern="*"):
+        """
+        Returns:
+            set: Names of the files in Anki's media folder, or None on error.
+        """
+        response = self.invoker.invoke("getMediaFilesNames", {"pattern": pattern})
+        if response.get("error"):
+            logger.error(f"Error listing media files: {response['error']}")
+            return None
+        return set(response.get("result", []))
+
+    def delete_media_file(self, filename):
+        response = self.invoker.invoke("deleteMediaFile", {"filename": filename})
+        if response.get("error"):
+            logger.error(f"Error deleting media file '{filename}': {response['error']}")
+            return False
+        logger.info(f"Deleted media file '{filename}'.")
+        return True
@@ -2,22 +2,47 @@ import requests
 import json
 from config.logger import logger
 
+# Constants for AnkiConnect requests
+ANKI_CONNECT_TIMEOUT = 60  # Seconds before a slow AnkiConnect request fails
+PROBE_TIMEOUT = 5  # Seconds allowed for the health probe
+
 
 class AnkiInvoker:
-    def __init__(self, connect_url) -> None:
+    def __init__(self, connect_url, session=None, breaker=None) -> None:
         self.connect_url = connect_url
-        pass
+        # A shared requests.Session keeps the AnkiConnect connection alive
+        self.session = session or requests.Session()
+        # A shared CircuitBreaker stops all managers calling a closed Anki
+        self.breaker = breaker
+
+    def ping(self):
+        """Health probe: whether AnkiConnect answers its `version` action."""
+        try:
+            response = self.session.post(
+                self.connect_url,
+                json={"action": "version", "version": 6},
+                timeout=PROBE_TIMEOUT,
+            )
+            response.raise_for_status()
+            return not response.json().get("error")
+        except (requests.exceptions.RequestException, ValueError):
+            return False
 
     def invoke(self, action, params=None):
         """Helper function to call AnkiConnect API with improved error handling and logging."""
         if not self.connect_url:
             raise ValueError("connect_url is not defined")
 
+        if self.breaker and not self.breaker.allow():
+            logger.debug(f"AnkiConnect unavailable, skipping action '{action}'.")
+            return {"error": "AnkiConnect is unavailable (circuit open)."}
+
         try:
             # Make the API request with proper parameter handling
-            response = requests.post(
+            response = self.session.post(
                 self.connect_url,
                 json={"action": action, "version": 6, "params": params or {}},
+                timeout=ANKI_CONNECT_TIMEOUT,
             )
 
             # Raise an exception if the response code is 4xx or 5xx
@@ -26,9 +51,13 @@ class AnkiInvoker:
             # Parse the JSON response
             result = response.json()
 
+            if self.breaker:
+                self.breaker.record_success()
             return result
         except requests.exceptions.RequestException as e:
             logger.error(f"HTTP Request failed for action '{action}': {e}")
+            if self.breaker:
+                self.breaker.record_failure()
             return {"error": str(e)}
         except ValueError as e:
             logger.error(f"Failed to parse response as JSON for action '{action}': {e}")
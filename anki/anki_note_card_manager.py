@@ -1,10 +1,21 @@
+import re
+
 from anki.anki_invoker import AnkiInvoker
 from config.logger import logger
 
+NOTE_UPDATE_BATCH_SIZE = 100  # updateNoteFields actions per "multi" request
+NOTES_INFO_PAGE_SIZE = 500  # Notes per notesInfo request when paging
+
+
+def media_search_query(filename):
+    """Anki search for notes whose fields mention a media file, wildcards escaped."""
+    escaped = re.sub(r'([\\"*_:])', r"\\\1", filename)
+    return f'"{escaped}"'
+
 
 class AnkiNoteManager:
-    def __init__(self, connect_url) -> None:
-        self.invoker = AnkiInvoker(connect_url)
+    def __init__(self, connect_url, session=None, breaker=None) -> None:
+        self.invoker = AnkiInvoker(connect_url, session, breaker)
         pass
 
     def note_ids_from_query(self, search_query):
@@ -53,12 +64,75 @@ class AnkiNoteManager:
 
         return notes
 
+    def note_pages_from_query(self, search_query, page_size=NOTES_INFO_PAGE_SIZE):
+        """
+        Yield the notes matching a query in pages, so a large collection is read
+        with several smaller notesInfo requests instead of one huge response.
+        """
+        note_ids = self.note_ids_from_query(search_query)
+        for start in range(0, len(note_ids), page_size):
+            yield self.notes_from_note_ids(note_ids[start : start + page_size])
+
+    def notes_referencing_media(self, filename):
+        """
+        Returns:
+            list: IDs of the notes in the whole collection that mention the
+            media file, or None on error.
+        """
+        query = media_search_query(filename)
+        response = self.invoker.invoke("findNotes", {"query": query})
+        if response.get("error"):
+            logger.error(f"Error finding notes with query '{query}': {response['error']}")
+            return None
+        return response.get("result", [])
+
     def update_note_field(self, note_id, field_name, new_content):
-        """Update a specific field of a note."""
+        """
+        Update a specific field of a note.
+
+        Returns:
+            bool: True if AnkiConnect accepted the update.
+        """
         params = {"note": {"id": note_id, "fields": {field_name: new_content}}}
         response = self.invoker.invoke("updateNoteFields", params)
         if response.get("error"):
             print(f"Error updating note {note_id}: {response['error']}")
+            return False
+        return True
+
+    def update_notes_fields(self, updates, batch_size=NOTE_UPDATE_BATCH_SIZE):
+        """
+        Update many notes with a few batched "multi" requests.
+
+        Args:
+            updates (list): [(note_id, {field_name: new_content})]
+
+        Returns:
+            list: IDs of the notes updated successfully.
+        """
+        updated = []
+        for start in range(0, len(updates), batch_size):
+            batch = updates[start : start + batch_size]
+            actions = [
+                {
+                    "action": "updateNoteFields",
+                    "params": {"note": {"id": note_id, "fields": fields}},
+                }
+                for note_id, fields in batch
+            ]
+            response = self.invoker.invoke("multi", {"actions": actions})
+            if response.get("error"):
+                logger.error(f"Error updating {len(batch)} notes: {response['error']}")
+                continue
+
+            for (note_id, _), result in zip(batch, response.get("result", [])):
+                if isinstance(result, dict) and result.get("error"):
+                    logger.error(f"Error updating note {note_id}: {result['error']}")
+                else:
+                    updated.append(note_id)
+
+        logger.info(f"Updated {len(updated)} of {len(updates)} notes.")
+        return updated
 
     # def notes_from_card_ids(self, card_ids):
     #     if not card_ids:
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import requests
+
+from config.logger import logger
+
+# Constants for audio post-processing
+DEFAULT_AUDIO_CACHE_DIR = "audio_cache"  # Processed files, named by source hash
+DEFAULT_AUDIO_FORMAT = "mp3"
+AUDIO_FORMATS = {
+    # format: (ffmpeg muxer, ffmpeg codec arguments)
+    "mp3": ("mp3", ["-c:a", "libmp3lame", "-b:a", "48k"]),
+    "ogg": ("ogg", ["-c:a", "libopus", "-b:a", "24k"]),
+}
+SILENCE_THRESHOLD = "-50dB"  # Leading/trailing audio quieter than this is trimmed
+LOUDNESS_FILTER = "loudnorm=I=-16:TP=-1.5:LRA=11"  # EBU R128 loudness target
+SAMPLE_RATE = 24000
+
+
+def audio_filter():
+    # silenceremove only trims the start, so reverse to trim the end as well
+    trim = f"silenceremove=start_periods=1:start_threshold={SILENCE_THRESHOLD}"
+    return f"{trim},areverse,{trim},areverse,{LOUDNESS_FILTER}"
+
+
+def process_audio(source_path, output_path, audio_format):
+    """
+    Trim silence, normalize loudness and transcode one file with ffmpeg.
+    Runs in a worker process, so it must stay a module-level function.
+
+    Returns:
+        str: output_path
+    """
+    muxer, codec_args = AUDIO_FORMATS[audio_format]
+    # Unique per task, so concurrent tasks never share a temporary file
+    temp_file = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-i", source_path]
+            + ["-af", audio_filter(), "-ac", "1", "-ar", str(SAMPLE_RATE)]
+            + codec_args
+            + ["-f", muxer, temp_file],
+            check=True,
+            capture_output=True,
+        )
+        os.replace(temp_file, output_path)
+        return output_path
+    finally:
+        for path in (source_path, temp_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class AudioProcessor:
+    def __init__(
+        self,
+        cache_dir=DEFAULT_AUDIO_CACHE_DIR,
+        audio_format=DEFAULT_AUDIO_FORMAT,
+        max_workers=None,
+        session=None,
+    ) -> None:
+        """
+        Post-process downloaded pronunciations in a process pool. Processed files
+        are cached by the hash of their source audio, so re-runs skip ffmpeg.
+        """
+        self.cache_dir = cache_dir
+        self.audio_format = audio_format
+        self.session = session or requests.Session()
+        self.enabled = shutil.which("ffmpeg") is not None
+        self.executor = None
+        self.in_flight = {}  # source hash: Future, so duplicates are processed once
+
+        if not self.enabled:
+            logger.warning("ffmpeg not found. Audio post-processing is disabled.")
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+
+    def output_path(self, source_hash):
+        return os.path.abspath(
+            os.path.join(self.cache_dir, f"{source_hash}.{self.audio_format}")
+        )
+
+    def output_filename(self, filename):
+        return f"{os.path.splitext(filename)[0]}.{self.audio_format}"
+
+    def download(self, url):
+        try:
+            response = self.session.get(url)
+            response.raise_for_status()
+            return response.content
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to download audio '{url}': {e}")
+            return None
+
+    def submit(self, item):
+        """
+        Download one item and hand it to the process pool.
+
+        Returns:
+            Future or str: The pending or cached output path, or None on failure.
+        """
+        data = self.download(item["url"])
+        if not data:
+            return None
+
+        source_hash = hashlib.sha256(data).hexdigest()
+        output_path = self.output_path(source_hash)
+        if os.path.exists(output_path):
+            logger.debug(f"Using processed audio for '{item['filename']}'.")
+            return output_path
+        future = self.in_flight.get(source_hash)
+        if future and not future.done():
+            return future
+
+        fd, source_path = tempfile.mkstemp(suffix=".source", dir=self.cache_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        future = self.executor.submit(
+            process_audio, source_path, output_path, self.audio_format
+        )
+        self.in_flight[source_hash] = future
+        future.add_done_callback(lambda done: self.in_flight.pop(source_hash, None))
+        return future
+
+    def submit_items(self, items):
+        """
+        Start post-processing a word's items without waiting for ffmpeg.
+
+        Returns:
+            list: (item, Future or cached path or None) pairs for `is_done` and `collect`.
+        """
+        return [(item, self.submit(item)) for item in items]
+
+    def is_done(self, pending):
+        return all(
+            not hasattr(result, "done") or result.done() for _, result in pending
+        )
+
+    def process(self, items):
+        """
+        Post-process a word's items and wait for the results. Downloads continue
+        while earlier items are being processed.
+
+        Args:
+            items (list): [{"filename": filename, "url": mp3_url}]
+
+        Returns:
+            list: [{"filename": filename, "path": processed_path}] or the original item.
+        """
+        if not self.enabled or not items:
+            return items
+        return self.collect(self.submit_items(items))
+
+    def collect(self, pending):
+        """
+        Wait for submitted items. Items that fail keep their URL, so Anki
+        downloads the original recording instead.
+
+        Returns:
+            list: [{"filename": filename, "path": processed_path}] or the original item.
+        """
+        processed = []
+        for item, result in pending:
+            try:
+                path = result.result() if hasattr(result, "result") else result
+            except Exception as e:
+                logger.error(f"Failed to process audio '{item['filename']}': {e}")
+                path = None
+
+            if path:
+                processed.append(
+                    {"filename": self.output_filename(item["filename"]), "path": path}
+                )
+            else:
+                processed.append(item)
+        return processed
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown()
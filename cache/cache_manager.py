@@ -1,19 +1,76 @@
+import contextlib
+import copy
 import json
 import os
+from cache.file_lock import FileLock
 from config.logger import logger
 from datetime import datetime, time, timedelta, timezone
+from words.word_normalizer import WordNormalizer
+
+# Constants for adaptive retry of failed words
+RETRY_BACKOFF_FACTOR = 2  # Retry interval multiplier per failed attempt
+MAX_RETRY_AFTER_DAYS = 365  # Maximum retry interval for "no pronunciations"
+TRANSIENT_RETRY_AFTER_HOURS = 1  # Initial retry interval for transient errors
+MAX_TRANSIENT_RETRY_AFTER_HOURS = 48  # Maximum retry interval for transient errors
+
+LATENCY_SMOOTHING = 0.1  # Weight of each new sample in the latency moving averages
+QUOTA_HISTORY_DAYS = 90  # Days of request counts kept for reports
+
+# Per-word sections merged entry by entry when several processes share the cache
+MERGED_SECTIONS = ("pronunciations", "failed_words", "attempted_words", "api_keys")
 
 
 class CacheManager:
-    def __init__(self, cache_file, request_limit, retry_after_days):
+    def __init__(
+        self,
+        cache_file,
+        request_limit,
+        retry_after_days,
+        default_language=None,
+        autosave=True,
+        normalizer=None,
+        read_only=False,
+    ):
         """
         Initialize the ForvoPronunciationCache instance by loading the cache.
+
+        Words of `default_language` are keyed by the bare word so existing caches
+        stay valid; other languages are namespaced as "language:word".
+
+        With `autosave` disabled, changes are only written by `flush`, which lets
+        long-running processes save periodically instead of on every change.
+
+        Words are canonicalized by `normalizer` (a WordNormalizer) before keying.
+
+        Several processes may share the cache file: writes happen under a file
+        lock and merge this process's changes into what is on disk.
+
+        A `read_only` cache, for reports and plans, is never written, takes no
+        lock and skips copying the disk state that merges start from.
         """
         logger.info("Creating CacheManager")
         self.cache_file = cache_file
-        self.cache = self.load_cache()
+        self.autosave = autosave
+        self.read_only = read_only
+        self.dirty = False
+        self.lock = FileLock(f"{cache_file}.lock")
+        self.disk_stamp = None  # (mtime, size) of the cache file we last read or wrote
+        with contextlib.nullcontext() if read_only else self.lock:
+            self.cache = self.load_cache()
+            # Last known state on disk
+            self.base = None if read_only else copy.deepcopy(self.cache)
+            self.disk_stamp = self.get_disk_stamp()
         self.request_limit = request_limit
         self.retry_after_days = retry_after_days
+        self.default_language = default_language
+        self.normalizer = normalizer or WordNormalizer()
+
+    def key(self, word, language=None):
+        """Cache key for a word in the given language."""
+        word = self.normalizer.normalize(word)
+        if language is None or language == self.default_language:
+            return word
+        return f"{language}:{word}"
 
     def get_204_error_string(self):
         return "No pronunciations found."
@@ -31,12 +88,13 @@ class CacheManager:
             logger.warning("Initializing cache structure.")
             cache = {
                 "pronunciations": {},  # word: [list of filenames]
-                "failed_words": {},  # word: {"error": "Error message", "attempts": 0}
+                "failed_words": {},  # word: {"error": "Error message", "attempts": 0, "transient": False}
                 "request_count": 0,  # Number of API requests made today
                 "last_reset": datetime.today().strftime("%Y-%m-%d"),  # Last reset date
             }
-            self.save_cache(cache)
-            logger.info(f"Initialized new cache and saved to '{self.cache_file}'.")
+            if not self.read_only:
+                self.save_cache(cache)
+                logger.info(f"Initialized new cache and saved to '{self.cache_file}'.")
             return cache
         try:
             with open(self.cache_file, "r", encoding="utf-8") as f:
@@ -52,7 +110,8 @@ class CacheManager:
                 "request_count": 0,
                 "last_reset": datetime.today().strftime("%Y-%m-%d"),
             }
-            self.save_cache(cache)
+            if not self.read_only:
+                self.save_cache(cache)
             return cache
         except Exception as e:
             logger.error(f"Unexpected error while loading cache: {e}")
@@ -77,13 +136,214 @@ class CacheManager:
             if os.path.exists(temp_file):
                 os.remove(temp_file)
 
-    def reset_request_count_if_new_day(self) -> dict:
+    def get_disk_stamp(self):
+        try:
+            stat = os.stat(self.cache_file)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def merge_request_count(self, base, mine, disk):
         """
-        Reset the request count if the current time is after 22:00 UTC and
-        the last reset was before 22:00 UTC of the current day.
+        Combine the daily request counts of this process and the others.
 
         Returns:
-            dict: The updated cache.
+            tuple: (request_count, last_reset)
+        """
+        mine_count = mine.get("request_count", 0)
+        disk_count = disk.get("request_count", 0)
+
+        if mine.get("last_reset") == base.get("last_reset"):
+            # Add our requests to whatever the other processes counted
+            return (
+                disk_count + mine_count - base.get("request_count", 0),
+                disk.get("last_reset"),
+            )
+        if disk.get("last_reset") == mine.get("last_reset"):
+            # Another process reset at the same boundary; both counted since
+            return disk_count + mine_count, mine.get("last_reset")
+        # We reset; the count on disk belongs to the previous day
+        return mine_count, mine.get("last_reset")
+
+    def merge_cache(self, base, mine, disk):
+        """
+        Three-way merge of this process's cache (`mine`, changed since `base`
+        was read) into the cache another process wrote to `disk`.
+
+        Returns:
+            dict: The merged cache.
+        """
+        merged = dict(disk)
+
+        for key in set(base) | set(mine):
+            if key in MERGED_SECTIONS or mine.get(key) == base.get(key):
+                continue
+            if key in mine:
+                merged[key] = mine[key]
+            else:
+                merged.pop(key, None)
+
+        for section in MERGED_SECTIONS:
+            base_section = base.get(section, {})
+            mine_section = mine.get(section, {})
+            result = dict(disk.get(section, {}))
+            for word in set(base_section) | set(mine_section):
+                if mine_section.get(word) == base_section.get(word):
+                    continue
+                if word in mine_section:
+                    result[word] = mine_section[word]
+                else:
+                    result.pop(word, None)
+            merged[section] = result
+
+        merged["request_count"], merged["last_reset"] = self.merge_request_count(
+            base, mine, disk
+        )
+
+        saved = [
+            cache.get("negative_cache_stats", {}).get("quota_saved", 0)
+            for cache in (base, mine, disk)
+        ]
+        merged["negative_cache_stats"] = dict(
+            disk.get("negative_cache_stats", {}),
+            quota_saved=saved[2] + saved[1] - saved[0],
+        )
+        return merged
+
+    def refresh(self):
+        """
+        Merge changes other processes wrote to the cache file into memory.
+        Call with the lock held.
+        """
+        if self.read_only:
+            return
+        stamp = self.get_disk_stamp()
+        if stamp is None or stamp == self.disk_stamp:
+            return
+
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                disk = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Could not read '{self.cache_file}' to merge: {e}")
+            return
+
+        self.cache = self.merge_cache(self.base, self.cache, disk)
+        self.base = copy.deepcopy(disk)  # merge_cache shares entries with disk
+        self.disk_stamp = stamp
+        logger.debug("Merged cache changes from another process.")
+
+    def write_cache(self):
+        """Merge with the file on disk and save, holding the lock throughout."""
+        if self.read_only:
+            return
+        with self.lock:
+            self.refresh()
+            self.save_cache(self.cache)
+            self.base = copy.deepcopy(self.cache)
+            self.disk_stamp = self.get_disk_stamp()
+            self.dirty = False
+
+    def persist(self):
+        """Save the cache now, or mark it for the next flush if autosave is off."""
+        if self.autosave:
+            self.write_cache()
+        else:
+            self.dirty = True
+
+    def flush(self):
+        """Save any changes that have not been written yet."""
+        if self.dirty:
+            self.write_cache()
+            logger.info(f"Cache flushed to '{self.cache_file}'.")
+
+    def get_key_usage(self, key_id):
+        """
+        Daily usage of one Forvo API key. A key seen for the first time on a
+        cache without per-key usage inherits the global request count, so the
+        count of a single existing key carries over.
+
+        Returns:
+            dict: {"request_count": int, "exhausted": bool}
+        """
+        api_keys = self.cache.get("api_keys", {})
+        if key_id in api_keys:
+            return api_keys[key_id]
+        return {
+            "request_count": 0 if api_keys else self.cache.get("request_count", 0),
+            "exhausted": False,
+        }
+
+    def track_key_usage(self, key_id):
+        """
+        Like get_key_usage, but adds the key's entry to the cache so it can be
+        changed. Reads must not add it: the merge would take the new entry for
+        this process's change and overwrite the count another process wrote.
+        Call with the lock held, after refresh().
+
+        Returns:
+            dict: {"request_count": int, "exhausted": bool}
+        """
+        key_usage = self.get_key_usage(key_id)
+        return self.cache.setdefault("api_keys", {}).setdefault(key_id, key_usage)
+
+    def reserve_requests(self, count=1, key_id=None):
+        """
+        Atomically reserve `count` requests of the daily quota shared by every
+        process using this cache file. With a `key_id`, the request_limit
+        applies to that API key; request_count keeps the total over all keys.
+
+        Returns:
+            bool: True if the requests were reserved, False if the limit is reached.
+        """
+        with self.lock:
+            self.refresh()
+            if key_id is None:
+                if self.cache.get("request_count", 0) + count > self.request_limit:
+                    logger.warning(
+                        f"Daily request limit of {self.request_limit} reached."
+                    )
+                    return False
+            else:
+                key_usage = self.track_key_usage(key_id)
+                if (
+                    key_usage["exhausted"]
+                    or key_usage["request_count"] + count > self.request_limit
+                ):
+                    logger.debug(f"Daily request limit reached for key {key_id}.")
+                    return False
+                key_usage["request_count"] += count
+            self.cache["request_count"] = self.cache.get("request_count", 0) + count
+            self.cache["last_request"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.write_cache()
+        return True
+
+    def set_key_exhausted(self, key_id):
+        """Mark an API key as out of requests until the next daily reset."""
+        with self.lock:
+            self.refresh()
+            key_usage = self.track_key_usage(key_id)
+            key_usage["exhausted"] = True
+            key_usage["request_count"] = max(
+                key_usage["request_count"], self.request_limit
+            )
+            self.write_cache()
+
+    def next_reset_time(self):
+        """
+        Returns:
+            datetime: The next 22:00 UTC, when Forvo resets the daily request count.
+        """
+        now_utc = datetime.now(timezone.utc)
+        next_reset = datetime.combine(now_utc.date(), time(22, 0), tzinfo=timezone.utc)
+        if now_utc >= next_reset:
+            next_reset += timedelta(days=1)
+        return next_reset
+
+    def latest_reset_time(self):
+        """
+        Returns:
+            datetime: The last 22:00 UTC, when the current quota day started.
         """
         # Current UTC time as a timezone-aware datetime
         now_utc = datetime.now(timezone.utc)
@@ -97,42 +357,85 @@ class CacheManager:
         # If current time is before the reset time, consider the reset time as yesterday
         if now_utc.time() < reset_time_utc:
             today_reset_datetime -= timedelta(days=1)
+        return today_reset_datetime
 
+    def get_last_reset(self):
+        """
+        Returns:
+            datetime: When the request count was last reset, in UTC, or None
+            if the cache holds no valid time.
+        """
         last_reset_str = self.cache.get("last_reset")
-        last_reset: datetime | None = None
-
-        if last_reset_str:
-            try:
-                # Parse the ISO formatted datetime string into a timezone-aware datetime
-                last_reset = datetime.fromisoformat(last_reset_str)
-                if last_reset.tzinfo is None:
-                    # Assume UTC if no timezone info is present
-                    last_reset = last_reset.replace(tzinfo=timezone.utc)
-                else:
-                    # Convert to UTC
-                    last_reset = last_reset.astimezone(timezone.utc)
-            except ValueError:
-                logger.error(
-                    "Invalid 'last_reset' format in cache. Resetting request count."
-                )
-                last_reset = None
+        if not last_reset_str:
+            return None
+        try:
+            # Parse the ISO formatted datetime string into a timezone-aware datetime
+            last_reset = datetime.fromisoformat(last_reset_str)
+        except ValueError:
+            logger.error("Invalid 'last_reset' format in cache. Resetting request count.")
+            return None
+        if last_reset.tzinfo is None:
+            # Assume UTC if no timezone info is present
+            return last_reset.replace(tzinfo=timezone.utc)
+        # Convert to UTC
+        return last_reset.astimezone(timezone.utc)
+
+    def needs_reset(self):
+        """Whether the request count is from before the current quota day."""
+        last_reset = self.get_last_reset()
+        return last_reset is None or last_reset < self.latest_reset_time()
 
-        # Determine if a reset is needed
-        needs_reset = now_utc >= today_reset_datetime and (
-            last_reset is None or last_reset < today_reset_datetime
-        )
+    def reset_request_count_if_new_day(self) -> dict:
+        """
+        Reset the request count if the current time is after 22:00 UTC and
+        the last reset was before 22:00 UTC of the current day.
 
-        if needs_reset:
-            self.cache["request_count"] = 0
-            # Set 'last_reset' to the reset time, not the current time
-            self.cache["last_reset"] = today_reset_datetime.isoformat()
-            self.save_cache(self.cache)
-            logger.info("Daily request count has been reset.")
-        else:
-            logger.info("Daily request count does not need to be reset.")
+        Returns:
+            dict: The updated cache.
+        """
+        # Decide under the lock, after picking up a reset another process may
+        # already have made, so resetting late can't wipe its new counts
+        with contextlib.nullcontext() if self.read_only else self.lock:
+            self.refresh()
+            last_reset = self.get_last_reset()
+            if last_reset is None or last_reset < self.latest_reset_time():
+                # Keep the finished quota day's usage, keyed by the day it started
+                if last_reset:
+                    self.record_quota_usage(last_reset.date().isoformat())
+                self.cache["request_count"] = 0
+                for key_usage in self.cache.get("api_keys", {}).values():
+                    key_usage["request_count"] = 0
+                    key_usage["exhausted"] = False
+                # Set 'last_reset' to the reset time, not the current time
+                self.cache["last_reset"] = self.latest_reset_time().isoformat()
+                # Save right away, so the merge base holds the reset and a later
+                # merge can't zero counts other processes made since
+                self.write_cache()
+                logger.info("Daily request count has been reset.")
+            else:
+                logger.debug("Daily request count does not need to be reset.")
 
         return self.cache
 
+    def record_quota_usage(self, day):
+        history = self.cache.setdefault("quota_history", {})
+        history[day] = {
+            "request_count": self.cache.get("request_count", 0),
+            "api_keys": {
+                key_id: key_usage.get("request_count", 0)
+                for key_id, key_usage in self.cache.get("api_keys", {}).items()
+            },
+        }
+        for old_day in sorted(history)[:-QUOTA_HISTORY_DAYS]:
+            del history[old_day]
+
+    def get_quota_history(self):
+        """
+        Returns:
+            dict: {day: {"request_count": n, "api_keys": {key_id: n}}} for past quota days.
+        """
+        return self.cache.get("quota_history", {})
+
     def get_attempted_words(self):
         return self.cache.get("attempted_words", {})
 
@@ -176,6 +479,15 @@ class CacheManager:
             return failed_word_data.get("last_attempt")
         return None
 
+    def parse_attempt_time(self, attempt_str):
+        if not attempt_str:
+            return None
+        try:
+            # Same "%Y-%m-%d %H:%M:%S" timestamps, parsed much faster than strptime
+            return datetime.fromisoformat(attempt_str)
+        except ValueError:
+            return None
+
     def get_time_since_last_attempt(self, word):
         last_attempt_str = self.get_last_attempt_str(word)
         if last_attempt_str:
@@ -208,7 +520,7 @@ class CacheManager:
         self.cache["request_count"] = incremented_request_count
         self.cache["last_request"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         logger.debug(f"incremented_request_count: {incremented_request_count}")
-        self.save_cache(self.cache)
+        self.persist()
 
     def set_last_failed_attempt(self, word):
         if "failed_words" in self.cache and word not in self.cache["pronunciations"]:
@@ -220,7 +532,7 @@ class CacheManager:
         self.cache.setdefault("attempted_words", {}).setdefault(word, {})[
             "last_attempt"
         ] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.save_cache(self.cache)
+        self.persist()
 
     def get_request_count(self):
         return self.cache["request_count"]
@@ -231,30 +543,57 @@ class CacheManager:
             limit = self.request_limit
 
         self.cache["request_count"] = limit
-        self.save_cache(self.cache)
+        self.persist()
 
     def set_request_count_to_limit(self):
         self.cache["request_count"] = self.request_limit
-        self.save_cache(self.cache)
+        self.persist()
 
-    def increment_fetch_failure(self, word, error_str):
+    def increment_fetch_failure(self, word, error_str, transient=False):
         """
         Increment the attempt count for a failed word by one.
         Creates failed_words[word].attempts / .error / .last_attempt if they don't exist
+
+        Transient failures (rate limits, server or JSON errors) keep their own
+        consecutive attempt count so they are re-checked quickly, without
+        pushing out the retry interval for "no pronunciations", which only
+        counts the empty results (`empty_attempts`).
         """
         try:
+            previous = self.cache.get("failed_words", {}).get(word, {})
+
+            # Bank the retries the flat window would have spent since the last attempt
+            time_since_last_attempt = self.get_time_since_last_attempt(word)
+            if time_since_last_attempt is not None and not previous.get("transient"):
+                skipped = self.skipped_flat_retries(word, time_since_last_attempt) - 1
+                if skipped > 0:
+                    stats = self.cache.setdefault("negative_cache_stats", {})
+                    stats["quota_saved"] = stats.get("quota_saved", 0) + skipped
+
             self.cache.setdefault("failed_words", {})[word] = {
                 "error": error_str,
-                "attempts": self.cache.get("failed_words", {})
-                .get(word, {})
-                .get("attempts", 0)
-                + 1,
+                "attempts": previous.get("attempts", 0) + 1,
+                "empty_attempts": self.get_empty_attempts(previous)
+                + (0 if transient else 1),
+                "transient": transient,
+                "transient_attempts": (
+                    previous.get("transient_attempts", 0) + 1 if transient else 0
+                ),
                 "last_attempt": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             }
-            self.save_cache(self.cache)
+            self.persist()
         except Exception as e:
             logger.exception(e)
 
+    def get_empty_attempts(self, failed_word_data):
+        """
+        Number of attempts that found no pronunciations. Entries written before
+        this was counted separately fall back to their total attempts.
+        """
+        return failed_word_data.get(
+            "empty_attempts", failed_word_data.get("attempts", 0)
+        )
+
     def log_failed_words(self):
         if "failed_words" in self.cache and self.cache["failed_words"]:
             logger.info(f"Total failed words: {len(self.cache['failed_words'])}")
@@ -278,15 +617,123 @@ class CacheManager:
         logger.debug(f"{word} in pronunciations: {word_in_pronunciations}")
         return word_in_pronunciations
 
+    def get_retry_interval(self, word):
+        """
+        Determine how long to wait before retrying a failed word.
+
+        Transient errors (429, 5xx, JSON errors) are re-checked quickly, backing
+        off from TRANSIENT_RETRY_AFTER_HOURS. Genuine "no pronunciations" results
+        back off exponentially from retry_after_days with every failed attempt.
+
+        Returns:
+            timedelta: The retry interval for the word.
+        """
+        failed_word_data = self.get_failed_word_data(word)
+
+        if failed_word_data.get("transient"):
+            attempts = max(failed_word_data.get("transient_attempts", 1), 1)
+            hours = TRANSIENT_RETRY_AFTER_HOURS * RETRY_BACKOFF_FACTOR ** (attempts - 1)
+            return timedelta(hours=min(hours, MAX_TRANSIENT_RETRY_AFTER_HOURS))
+
+        attempts = max(self.get_empty_attempts(failed_word_data), 1)
+        days = self.retry_after_days * RETRY_BACKOFF_FACTOR ** (attempts - 1)
+        return timedelta(days=min(days, max(MAX_RETRY_AFTER_DAYS, self.retry_after_days)))
+
     def can_reattempt(self, word):
+        if self.get_failed_word_data(word).get("invalidated"):
+            logger.info(f"Failure for '{word}' was invalidated. Retrying.")
+            return True
+
         time_since_last_attempt = self.get_time_since_last_attempt(word)
-        logger.info(f"last attempt was {time_since_last_attempt.days} days ago.")
-        if time_since_last_attempt and time_since_last_attempt < timedelta(
-            days=self.retry_after_days
-        ):
+        if time_since_last_attempt is None:
+            return True
+
+        retry_interval = self.get_retry_interval(word)
+        logger.info(
+            f"last attempt was {time_since_last_attempt.days} days ago, "
+            f"retry interval is {retry_interval}."
+        )
+        if time_since_last_attempt < retry_interval:
             return False
         return True
 
+    def invalidate_failures(self, words):
+        """
+        Mark failed words as immediately retryable, e.g. because Forvo now lists
+        pronunciations for them.
+
+        Args:
+            words (iterable): Words reported as pronounced by Forvo.
+
+        Returns:
+            int: The number of failed words that were invalidated.
+        """
+        failed_words = self.get_failed_words()
+        invalidated = 0
+        for word in words:
+            if word in failed_words and not failed_words[word].get("invalidated"):
+                failed_words[word]["invalidated"] = True
+                invalidated += 1
+        if invalidated:
+            self.persist()
+        logger.info(f"Invalidated {invalidated} failed words.")
+        return invalidated
+
+    def skipped_flat_retries(self, word, elapsed):
+        """
+        Number of retries the flat retry_after_days window would have spent on
+        a failed word during `elapsed`.
+        """
+        if self.retry_after_days <= 0:
+            return 0
+        return int(elapsed / timedelta(days=self.retry_after_days))
+
+    def get_negative_cache_stats(self):
+        """
+        Summarize the failed-word cache and the quota saved by adaptive backoff,
+        compared to retrying every failed word each retry_after_days.
+
+        Returns:
+            dict: Counts of failed words and requests saved.
+        """
+        stats = self.cache.get("negative_cache_stats", {})
+        banked = stats.get("quota_saved", 0)
+        pending = 0
+        transient = 0
+        backed_off = 0
+
+        for word, details in self.get_failed_words().items():
+            if details.get("transient"):
+                transient += 1
+                continue
+            if details.get("invalidated"):
+                continue
+            last_attempt = self.parse_attempt_time(details.get("last_attempt"))
+            if last_attempt is None:
+                continue
+            time_since_last_attempt = datetime.now() - last_attempt
+            if time_since_last_attempt < self.get_retry_interval(word):
+                skipped = self.skipped_flat_retries(word, time_since_last_attempt)
+                if skipped:
+                    backed_off += 1
+                    pending += skipped
+
+        return {
+            "failed_words": len(self.get_failed_words()),
+            "transient_failures": transient,
+            "backed_off_words": backed_off,
+            "quota_saved": banked + pending,
+        }
+
+    def log_negative_cache_stats(self):
+        stats = self.get_negative_cache_stats()
+        logger.info(
+            f"Negative cache: {stats['failed_words']} failed words "
+            f"({stats['transient_failures']} transient), "
+            f"{stats['backed_off_words']} backed off beyond the flat retry window, "
+            f"{stats['quota_saved']} requests saved."
+        )
+
     def set_unfailed(self, word):
         # Remove from failed_words if present
         if "failed_words" in self.cache and word in self.cache["failed_words"]:
@@ -301,4 +748,88 @@ class CacheManager:
         # ] }
         cache_pronunciations = self.cache.get("pronunciations", {})
         cache_pronunciations[word] = pronunciations
-        self.save_cache(self.cache)
+        self.persist()
+
+    def remove_pronunciations(self, word):
+        """Forget a word's pronunciations, so the word is fetched again."""
+        if word in self.cache.get("pronunciations", {}):
+            del self.cache["pronunciations"][word]
+            self.persist()
+
+    def needs_migration(self):
+        """True if the cache was keyed with different (or no) normalization settings."""
+        return self.cache.get("normalization") != {
+            "case_fold": self.normalizer.case_fold
+        }
+
+    def migrate_keys(self):
+        """
+        Re-key the cache with the current normalizer, merging entries that now
+        share a key: pronunciations are combined without duplicates, failures
+        of words that have pronunciations are dropped, and otherwise the most
+        recent attempt is kept with the highest attempt count.
+
+        Returns:
+            int: The number of entries merged into another one.
+        """
+        normalize = self.normalizer.normalize
+        merged = 0
+
+        pronunciations = {}
+        for word, filenames in self.cache.get("pronunciations", {}).items():
+            key = normalize(word)
+            if key in pronunciations:
+                merged += 1
+            combined = pronunciations.setdefault(key, [])
+            combined.extend(f for f in filenames if f not in combined)
+
+        failed_words = {}
+        for word, details in self.cache.get("failed_words", {}).items():
+            key = normalize(word)
+            if key in failed_words or key in pronunciations:
+                merged += 1
+            if key in pronunciations:
+                continue
+            previous = failed_words.get(key)
+            if previous is None:
+                failed_words[key] = dict(details)
+                continue
+            latest = max(previous, details, key=lambda d: d.get("last_attempt") or "")
+            failed_words[key] = dict(
+                latest,
+                attempts=max(previous.get("attempts", 0), details.get("attempts", 0)),
+                empty_attempts=max(
+                    self.get_empty_attempts(previous), self.get_empty_attempts(details)
+                ),
+            )
+
+        attempted_words = {}
+        for word, details in self.cache.get("attempted_words", {}).items():
+            key = normalize(word)
+            previous = attempted_words.get(key, {})
+            if (details.get("last_attempt") or "") >= (
+                previous.get("last_attempt") or ""
+            ):
+                attempted_words[key] = details
+
+        self.cache["pronunciations"] = pronunciations
+        self.cache["failed_words"] = failed_words
+        self.cache["attempted_words"] = attempted_words
+        self.cache["normalization"] = {"case_fold": self.normalizer.case_fold}
+        self.persist()
+        logger.info(f"Migrated cache keys, merged {merged} duplicate entries.")
+        return merged
+
+    def record_latency(self, upstream, seconds):
+        """
+        Update the moving average latency of an upstream call, e.g. "forvo".
+        Saved with the next cache write, so timing never adds writes of its own.
+        """
+        latency = self.cache.setdefault("latency", {}).setdefault(
+            upstream, {"average": seconds, "samples": 0}
+        )
+        latency["average"] += LATENCY_SMOOTHING * (seconds - latency["average"])
+        latency["samples"] += 1
+
+    def get_latency(self, upstream, default=None):
+        return self.cache.get("latency", {}).get(upstream, {}).get("average", default)
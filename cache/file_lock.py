@@ -0,0 +1,58 @@
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_RETRY_INTERVAL = 0.05  # Seconds between attempts to take a Windows lock
+
+
+class FileLock:
+    def __init__(self, path) -> None:
+        """
+        Re-entrant advisory lock on `path`, shared by all processes using the
+        same cache file (cron runs, manual runs, find_untried_words.py).
+        """
+        self.path = path
+        self.file = None
+        self.depth = 0
+
+    def acquire(self):
+        if self.depth:
+            self.depth += 1
+            return
+
+        self.file = open(self.path, "a+")
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        else:
+            self.file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(LOCK_RETRY_INTERVAL)
+        self.depth = 1
+
+    def release(self):
+        self.depth -= 1
+        if self.depth:
+            return
+
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -0,0 +1,87 @@
+import json
+import sqlite3
+import time
+import zlib
+
+from config.logger import logger
+
+# Constants for the raw Forvo response store
+DEFAULT_RESPONSE_CACHE_FILE = "forvo_responses.sqlite3"
+DEFAULT_RESPONSE_TTL_DAYS = 180  # Responses older than this are not served and get evicted
+DEFAULT_MAX_RESPONSES = 100000  # Oldest responses beyond this count get evicted
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        cache_file=DEFAULT_RESPONSE_CACHE_FILE,
+        ttl_days=DEFAULT_RESPONSE_TTL_DAYS,
+        max_responses=DEFAULT_MAX_RESPONSES,
+    ) -> None:
+        """
+        Persistent store of raw Forvo word-pronunciations responses, compressed
+        with zlib in SQLite and keyed like the pronunciation cache. Lets filenames,
+        ranking and note fields be rebuilt without querying the API again.
+        """
+        self.cache_file = cache_file
+        self.ttl_seconds = ttl_days * 24 * 60 * 60
+        self.max_responses = max_responses
+        self.connection = sqlite3.connect(cache_file, timeout=30)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, word TEXT, language TEXT, "
+                "fetched_at REAL, payload BLOB)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_fetched_at "
+                "ON responses (fetched_at)"
+            )
+
+    def is_fresh(self, fetched_at):
+        return time.time() - fetched_at <= self.ttl_seconds
+
+    def get(self, key):
+        """
+        Returns:
+            dict: The raw response for a cache key, or None if missing or expired.
+        """
+        row = self.connection.execute(
+            "SELECT fetched_at, payload FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if not row or not self.is_fresh(row[0]):
+            return None
+        return json.loads(zlib.decompress(row[1]))
+
+    def put(self, key, word, language, data):
+        payload = zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, word, language, time.time(), payload),
+            )
+
+    def evict(self):
+        """
+        Delete expired responses and the oldest ones beyond max_responses.
+
+        Returns:
+            int: The number of responses deleted.
+        """
+        with self.connection:
+            expired = self.connection.execute(
+                "DELETE FROM responses WHERE fetched_at < ?",
+                (time.time() - self.ttl_seconds,),
+            ).rowcount
+            overflow = self.connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY fetched_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_responses,),
+            ).rowcount
+        if expired or overflow:
+            logger.info(f"Evicted {expired + overflow} raw Forvo responses.")
+        return expired + overflow
+
+    def close(self):
+        self.connection.close()
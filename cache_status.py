@@ -0,0 +1,105 @@
+import argparse
+import json
+
+from anki.anki_note_card_manager import AnkiNoteManager
+from cache.cache_manager import CacheManager
+from config.config import ANKI_CONNECT_URL, CACHE_FILE, FORVO_LANGUAGE, RETRY_AFTER_DAYS
+from pipeline.pronunciation_pipeline import WORD_FIELD
+from profiling.profiler import add_profiling_args, profiler_from_args
+from report.cache_report import CacheReport
+from words.word_normalizer import CASE_FOLD, WordNormalizer
+
+
+def parse_local_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Report coverage, failures, retries and quota usage from the pronunciation cache."
+    )
+    parser.add_argument(
+        "--anki-query",
+        type=str,
+        default=None,
+        help="Also read the words of the notes matching this Anki search, in pages, to count the untried words",
+    )
+    parser.add_argument(
+        "--language",
+        type=str,
+        default=FORVO_LANGUAGE,
+        help=f"Language of the words read from Anki (default: {FORVO_LANGUAGE})",
+    )
+    parser.add_argument(
+        "--field",
+        type=str,
+        default=WORD_FIELD,
+        help=f"Note field holding the word (default: {WORD_FIELD})",
+    )
+    parser.add_argument(
+        "--retry-after-days",
+        type=int,
+        default=RETRY_AFTER_DAYS,
+        help="Initial number of days to wait before retrying a failed word, as passed to main.py (default: 30)",
+    )
+    parser.add_argument(
+        "--case-sensitive",
+        action="store_true",
+        default=not CASE_FOLD,
+        help="Key words the way main.py --case-sensitive does",
+    )
+    parser.add_argument(
+        "--api-keys",
+        type=int,
+        default=None,
+        help="Number of API keys main.py runs with, for the daily capacity (default: the keys used today or on the last quota day)",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the report as JSON instead of logging it",
+    )
+    add_profiling_args(parser)
+    return parser.parse_args(args)
+
+
+def build_report(args, profiler):
+    """
+    Returns:
+        tuple: The CacheReport and the report dict.
+    """
+    cache_manager = CacheManager(
+        CACHE_FILE,
+        500,
+        args.retry_after_days,
+        default_language=FORVO_LANGUAGE,
+        autosave=False,
+        normalizer=WordNormalizer(case_fold=not args.case_sensitive),
+        read_only=True,
+    )
+    report = CacheReport(cache_manager, args.api_keys)
+
+    anki_keys = None
+    if args.anki_query:
+        anki_manager = AnkiNoteManager(ANKI_CONNECT_URL)
+        anki_keys = report.keys_from_note_pages(
+            anki_manager.note_pages_from_query(args.anki_query),
+            args.language,
+            args.field,
+        )
+        profiler.stage("notes_loaded")
+
+    result = report.build(anki_keys)
+    profiler.stage("report_built")
+    return report, result
+
+
+def main():
+    args = parse_local_args()
+    with profiler_from_args(args) as profiler:
+        report, result = build_report(args, profiler)
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        report.log_report(result)
+
+
+if __name__ == "__main__":
+    main()
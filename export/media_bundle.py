@@ -0,0 +1,109 @@
+import base64
+import fnmatch
+import os
+import shutil
+
+import requests
+
+from config.logger import logger
+from forvo.forvo_manager import REQUEST_TIMEOUT
+
+
+class MediaBundle:
+    def __init__(
+        self, bundle_dir, session=None, anki_media_dir=None, anki_file_manager=None
+    ) -> None:
+        """
+        Stand-in for AnkiFileManager in bulk export mode: recordings are
+        downloaded (or copied, once post-processed) into `bundle_dir` instead of
+        being stored one by one through AnkiConnect. Files already in Anki's
+        media folder (`anki_media_dir`, or listed by `anki_file_manager` when
+        the folder can't be read) count as stored.
+        """
+        self.bundle_dir = bundle_dir
+        self.session = session or requests.Session()
+        self.anki_media_dir = anki_media_dir
+        self.anki_file_manager = anki_file_manager
+        os.makedirs(bundle_dir, exist_ok=True)
+
+    def store_media_file(self, filename, url=None, path=None):
+        """
+        Returns:
+            str: The stored filename, or None on failure.
+        """
+        target = os.path.join(self.bundle_dir, filename)
+        temp_file = f"{target}.tmp"
+        try:
+            if path:
+                shutil.copyfile(path, temp_file)
+            else:
+                response = self.session.get(url, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+                with open(temp_file, "wb") as f:
+                    f.write(response.content)
+            os.replace(temp_file, target)
+        except (OSError, requests.exceptions.RequestException) as e:
+            logger.error(f"Failed to bundle media file '{filename}': {e}")
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            return None
+        logger.debug(f"Bundled media file '{filename}'.")
+        return filename
+
+    def copy_media_file(self, source, filename):
+        """
+        Bundle a copy of a file from Anki's media folder under another name.
+
+        Returns:
+            str: The bundled filename, or None on failure.
+        """
+        target = os.path.join(self.bundle_dir, filename)
+        try:
+            if self.anki_media_dir and os.path.exists(
+                os.path.join(self.anki_media_dir, source)
+            ):
+                shutil.copyfile(os.path.join(self.anki_media_dir, source), target)
+                return filename
+            data = (
+                self.anki_file_manager.retrieve_media_file(source)
+                if self.anki_file_manager
+                else None
+            )
+            if data is None:
+                return None
+            with open(target, "wb") as f:
+                f.write(base64.b64decode(data))
+        except OSError as e:
+            logger.error(f"Failed to bundle media file '{filename}': {e}")
+            return None
+        return filename
+
+    def get_media_file_names(self, pattern="*"):
+        """
+        Returns:
+            set: Names of the files in the bundle and in Anki's media folder,
+            or None if Anki's media files can't be listed.
+        """
+        names = set(fnmatch.filter(os.listdir(self.bundle_dir), pattern))
+        if self.anki_media_dir:
+            try:
+                names.update(fnmatch.filter(os.listdir(self.anki_media_dir), pattern))
+                return names
+            except OSError as e:
+                logger.warning(f"Could not read media folder: {e}")
+
+        # Ask AnkiConnect rather than treat every file outside the bundle as missing
+        if not self.anki_file_manager:
+            logger.error("Anki's media files can't be listed.")
+            return None
+        anki_names = self.anki_file_manager.get_media_file_names(pattern)
+        if anki_names is None:
+            return None
+        return names | anki_names
+
+    def delete_media_file(self, filename):
+        path = os.path.join(self.bundle_dir, filename)
+        if not os.path.exists(path):
+            return False
+        os.remove(path)
+        return True
@@ -0,0 +1,99 @@
+import csv
+import os
+import re
+
+from anki.anki_note_card_manager import NOTE_UPDATE_BATCH_SIZE
+from config.logger import logger
+
+
+class NoteImportWriter:
+    def __init__(self, anki_note_card_manager) -> None:
+        """
+        Stand-in for AnkiNoteManager in bulk export mode: notes are still read
+        over AnkiConnect, but field updates are collected and written as Anki
+        text import files, one per note type. Anki matches the rows to the
+        existing notes on their first field and updates them in one import.
+        """
+        self.anki_note_card_manager = anki_note_card_manager
+        self.notes = {}  # noteId: note as read from Anki
+        self.field_names = {}  # noteId: fields the note type has
+        self.updates = {}  # noteId: {field_name: new_content}
+
+    def remember_notes(self, notes):
+        for note in notes:
+            self.notes[note["noteId"]] = note
+            self.field_names[note["noteId"]] = sorted(
+                note.get("fields", {}),
+                key=lambda name: note["fields"][name].get("order", 0),
+            )
+        return notes
+
+    def note_ids_from_query(self, search_query):
+        return self.anki_note_card_manager.note_ids_from_query(search_query)
+
+    def notes_from_query(self, search_query):
+        return self.remember_notes(
+            self.anki_note_card_manager.notes_from_query(search_query)
+        )
+
+    def notes_from_note_ids(self, note_ids):
+        return self.remember_notes(
+            self.anki_note_card_manager.notes_from_note_ids(note_ids)
+        )
+
+    def notes_referencing_media(self, filename):
+        # Collected updates are not in Anki yet, so old references still count
+        return self.anki_note_card_manager.notes_referencing_media(filename)
+
+    def update_note_field(self, note_id, field_name, new_content):
+        if field_name not in self.field_names.get(note_id, []):
+            logger.debug(f"Note {note_id} has no field '{field_name}'. Not exported.")
+            return False
+        self.updates.setdefault(note_id, {})[field_name] = new_content
+        return True
+
+    def update_notes_fields(self, updates, batch_size=NOTE_UPDATE_BATCH_SIZE):
+        updated = []
+        for note_id, fields in updates:
+            results = [
+                self.update_note_field(note_id, field_name, new_content)
+                for field_name, new_content in fields.items()
+            ]
+            if all(results):
+                updated.append(note_id)
+        return updated
+
+    def write(self, export_dir):
+        """
+        Write the collected updates as tab-separated files with Anki's import
+        headers: the note's first field to match on, then the updated fields.
+
+        Returns:
+            list: Paths of the files written.
+        """
+        os.makedirs(export_dir, exist_ok=True)
+        rows_by_type = {}  # (modelName, columns): [row]
+        for note_id, fields in self.updates.items():
+            note = self.notes[note_id]
+            first_field, *other_fields = self.field_names[note_id]
+            columns = tuple(
+                [first_field] + [name for name in other_fields if name in fields]
+            )
+            row = [
+                fields.get(name, note["fields"][name].get("value", ""))
+                for name in columns
+            ]
+            rows_by_type.setdefault((note.get("modelName", ""), columns), []).append(row)
+
+        paths = []
+        for (model_name, columns), rows in sorted(rows_by_type.items()):
+            name = re.sub(r"[^\w.-]+", "_", "_".join((model_name,) + columns[1:]))
+            path = os.path.join(export_dir, f"{name}.txt")
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write("#separator:tab\n#html:true\n")
+                f.write(f"#notetype:{model_name}\n")
+                f.write("#columns:" + "\t".join(columns) + "\n")
+                csv.writer(f, delimiter="\t", lineterminator="\n").writerows(rows)
+            logger.info(f"Wrote {len(rows)} note updates to '{path}'.")
+            paths.append(path)
+        return paths
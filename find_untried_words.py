@@ -1,33 +1,37 @@
-from anki.anki_note_card_manager import AnkiNoteManager
-from cache.cache_manager import CacheManager
-from config.config import ANKI_CONNECT_URL, CACHE_FILE
+import argparse
+
+from cache_status import build_report, parse_local_args as parse_status_args
 from config.logger import logger
+from profiling.profiler import add_profiling_args, profiler_from_args
+
+# Superseded by cache_status.py, which reports far more; kept for old scripts.
+UNTRIED_QUERY = "-tag:preposition"
+
+
+def parse_local_args():
+    parser = argparse.ArgumentParser(
+        description="Count the words on notecards that have never been looked up on Forvo (see cache_status.py)."
+    )
+    add_profiling_args(parser)
+    return parser.parse_args()
 
 
 def main():
 
+    args = parse_local_args()
+
     print("starting")
 
+    status_args = parse_status_args([f"--anki-query={UNTRIED_QUERY}"])
+
     try:
-        # Initialize maangers
-        anki_manager = AnkiNoteManager(ANKI_CONNECT_URL)
-        cache_manager = CacheManager(CACHE_FILE, 500, 30)
-
-        # create unique list of words on notecards
-        notes = anki_manager.notes_from_query("-tag:preposition")
-        words = [
-            note["fields"]["Word"]["value"]
-            for note in notes
-            if note.get("fields", {}).get("Word", {}.get("value"))
-        ]
-        words = list(set(words))
-
-        # Filter by whether or not we've attempted to fetch them
-        untried = [word for word in words if cache_manager.untried(word)]
-
-        logger.info(f"len(words): {len(words)}")
-        logger.info(f"len(untried): {len(untried)}")
-        logger.info(f"difference: {len(words) - len(untried)}")
+        with profiler_from_args(args) as profiler:
+            report, result = build_report(status_args, profiler)
+
+        words = result["words"]
+        logger.info(f"len(words): {words['in_anki']}")
+        logger.info(f"len(untried): {words['untried']}")
+        logger.info(f"difference: {words['in_anki'] - words['untried']}")
 
     except:
         logger.exception("Exception")
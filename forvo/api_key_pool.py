@@ -0,0 +1,93 @@
+import hashlib
+
+from config.logger import logger
+
+MAX_KEY_FAILURES = 3  # Consecutive errors before a key is skipped for the rest of the run
+KEY_ERROR_STATUSES = (401, 403)  # Responses that blame the key rather than Forvo
+
+
+def key_id(api_key):
+    """Short, stable id for an API key, so the key itself is never written to the cache."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+
+
+class ApiKeyPool:
+    def __init__(self, api_keys, cache_manager) -> None:
+        """
+        Spread Forvo requests over several API keys. Each key has its own daily
+        counter in the cache (limited to cache_manager.request_limit and reset
+        at 22:00 UTC with the others) and a health state.
+        """
+        self.keys = {key_id(api_key): api_key for api_key in api_keys if api_key}
+        self.cache_manager = cache_manager
+        self.failures = {}  # key_id: consecutive errors during this run
+
+    def is_healthy(self, key_id):
+        return self.failures.get(key_id, 0) < MAX_KEY_FAILURES
+
+    def remaining(self, key_id):
+        key_usage = self.cache_manager.get_key_usage(key_id)
+        if key_usage["exhausted"] or not self.is_healthy(key_id):
+            return 0
+        return max(self.cache_manager.request_limit - key_usage["request_count"], 0)
+
+    def total_remaining(self):
+        return sum(self.remaining(key_id) for key_id in self.keys)
+
+    def acquire(self):
+        """
+        Reserve one request on the key with the most remaining budget.
+
+        Returns:
+            tuple: (key_id, api_key), or None if every key is exhausted.
+        """
+        by_budget = sorted(self.keys, key=self.remaining, reverse=True)
+        for key_id in by_budget:
+            if self.remaining(key_id) and self.cache_manager.reserve_requests(
+                1, key_id
+            ):
+                return key_id, self.keys[key_id]
+        logger.warning("Daily request limit reached for every API key.")
+        return None
+
+    def mark_exhausted(self, key_id):
+        logger.warning(f"API key {key_id} reached its daily limit. Failing over.")
+        self.cache_manager.set_key_exhausted(key_id)
+
+    def record_result(self, key_id, response):
+        """
+        Update a key's health from the response to a request made with it.
+        Only errors specific to the key count against it: timeouts, connection
+        errors and server errors are Forvo's, and left to the circuit breaker.
+        """
+        if response is None or (response["status_code"] or 0) >= 500:
+            return
+        if response["status_code"] not in KEY_ERROR_STATUSES:
+            self.failures[key_id] = 0
+        else:
+            self.failures[key_id] = self.failures.get(key_id, 0) + 1
+            if not self.is_healthy(key_id):
+                logger.error(f"API key {key_id} keeps being rejected. Skipping it.")
+
+    def report(self):
+        """
+        Log and return each key's usage.
+
+        Returns:
+            dict: key_id: {"request_count", "remaining", "exhausted", "healthy"}
+        """
+        usage = {}
+        for key_id in self.keys:
+            key_usage = self.cache_manager.get_key_usage(key_id)
+            usage[key_id] = {
+                "request_count": key_usage["request_count"],
+                "remaining": self.remaining(key_id),
+                "exhausted": key_usage["exhausted"],
+                "healthy": self.is_healthy(key_id),
+            }
+            logger.info(
+                f"API key {key_id}: {key_usage['request_count']}/{self.cache_manager.request_limit} requests used"
+                f"{', exhausted' if key_usage['exhausted'] else ''}"
+                f"{', failing' if not self.is_healthy(key_id) else ''}."
+            )
+        return usage
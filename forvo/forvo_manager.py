@@ -14,19 +14,32 @@ INITIAL_BACKOFF = 1  # Initial backoff time in seconds
 MAX_BACKOFF = 60  # Maximum backoff time in seconds
 BACKOFF_FACTOR = 2  # Exponential factor
 
+# Constants for timeouts
+REQUEST_TIMEOUT = 30  # Seconds before a slow Forvo request fails
+PROBE_TIMEOUT = 5  # Seconds allowed for the health probe
+FORVO_API_ROOT = "https://apifree.forvo.com/"
+
 
 class ForvoManager:
-    def __init__(self):
-        pass
+    def __init__(self, session=None):
+        # A shared requests.Session pools connections across words and jobs
+        self.session = session or requests.Session()
+
+    def make_url(self, encoded_word, language=FORVO_LANGUAGE, api_key=FORVO_API_KEY):
+        url = f"https://apifree.forvo.com/key/{api_key}/format/json/action/word-pronunciations/word/{encoded_word}/language/{language}"
+        logger.info(url)
+        return url
 
-    def make_url(self, encoded_word):
-        url = f"https://apifree.forvo.com/key/{FORVO_API_KEY}/format/json/action/word-pronunciations/word/{encoded_word}/language/{FORVO_LANGUAGE}"
+    def make_pronounced_words_search_url(
+        self, encoded_search, language=FORVO_LANGUAGE, api_key=FORVO_API_KEY
+    ):
+        url = f"https://apifree.forvo.com/key/{api_key}/format/json/action/pronounced-words-search/search/{encoded_search}/language/{language}"
         logger.info(url)
         return url
 
     def invoke(self, url, action, params=None):
         try:
-            response = requests.post(
+            response = self.session.post(
                 url, json={"action": action, "version": 6, "params": params or {}}
             )
             response.raise_for_status()
@@ -39,22 +52,46 @@ class ForvoManager:
             logger.error(f"JSON parsing failed for action '{action}': {e}")
             return {"error": f"JSON parsing error: {str(e)}"}
 
+    def ping(self):
+        """
+        Health probe: whether the Forvo API host answers. It needs no API key,
+        so it costs no requests from the daily limit.
+        """
+        try:
+            response = self.session.head(FORVO_API_ROOT, timeout=PROBE_TIMEOUT)
+            return response.status_code < 500
+        except requests.exceptions.RequestException:
+            return False
+
     def request_get(self, url):
-        response = requests.get(url)
+        response = self.session.get(url, timeout=REQUEST_TIMEOUT)
         logger.info(response)
         return response
 
     def encode(self, word):
         return requests.utils.quote(word)
 
-    def filename_and_url_from_data(self, data, word):
+    def filename_prefix(self, word, language=FORVO_LANGUAGE):
+        """Start of a word's recording filenames, before the speaker details."""
+        prefix = word if language == FORVO_LANGUAGE else f"{language}_{word}"
+        return prefix.replace("/", "_")
+
+    def filename_and_url_from_data(
+        self, data, word, language=FORVO_LANGUAGE, selector=None
+    ):
 
         my_data = []
 
         if "items" in data and isinstance(data["items"], list):
             ## see temp.json for example of data structure
+            items = data["items"]
+            if selector:
+                # Rank by votes/metadata and keep only the best pronunciations
+                items = selector.select(
+                    [item for item in items if item.get("pathmp3")]
+                )
             mp3_index = 1
-            for item in data["items"]:
+            for item in items:
                 if item.get("pathmp3"):
                     mp3_url = item["pathmp3"]
 
@@ -72,21 +109,92 @@ class ForvoManager:
                     # )  # Assuming 'dialect' field exists
                     username = item.get("username", "Anonymous").replace(" ", "_")
                     gender = item.get("sex", "n").replace(" ", "_")
-                    filename = f"{word}_{username}_{gender}_{mp3_index}.mp3".replace(
+                    # Other languages' recordings of the same word are kept apart
+                    # by a language prefix
+                    prefix = self.filename_prefix(word, language)
+                    filename = f"{prefix}_{username}_{gender}_{mp3_index}.mp3"
+                    filename = filename.replace(
                         "/", "_"
                     )  # Replace any '/' to avoid path issues
                     my_data.append({"filename": filename, "url": mp3_url})
                     mp3_index += 1
         return my_data
 
+    def fetch_pronounced_words(
+        self, search, language=FORVO_LANGUAGE, api_key=FORVO_API_KEY
+    ):
+        """
+        Fetch the words matching `search` that Forvo lists as pronounced.
+        Used as a signal to invalidate cached failures early.
+
+        Returns:
+            set: The pronounced words, or None if the request failed.
+        """
+        url = self.make_pronounced_words_search_url(
+            self.encode(search), language, api_key
+        )
+        try:
+            response = self.request_get(url)
+            if response.status_code != 200:
+                logger.error(
+                    f"Error searching Forvo for '{search}': Status {response.status_code}, Response: {response.text}"
+                )
+                return None
+            data = response.json()
+        except ValueError:
+            logger.error(f"Invalid JSON response for search '{search}'.")
+            return None
+        except requests.exceptions.RequestException as e:
+            logger.error(f"HTTP Request failed for search '{search}': {e}")
+            return None
+
+        words = set()
+        if "items" in data and isinstance(data["items"], list):
+            for item in data["items"]:
+                word = item.get("original") or item.get("word")
+                if word:
+                    words.add(word)
+        logger.info(f"Forvo lists {len(words)} pronounced words for '{search}'.")
+        return words
+
+    def response_from_data(self, data, word, language=FORVO_LANGUAGE, selector=None):
+        """
+        Turn a raw word-pronunciations response, fresh or cached, into
+        filename/url pairs.
+
+        Returns:
+            dict: {"word", "language", "data", "raw", "status_code"}
+        """
+        my_response = {
+            "word": word,
+            "language": language,
+            "data": self.filename_and_url_from_data(data, word, language, selector),
+            "raw": data,
+            "message": None,
+        }
+
+        if not my_response["data"]:
+            # If that came back empty, we have no data
+            logger.warning(f"No pronunciations found for '{word}'.")
+            my_response["status_code"] = 204
+        else:
+            # Otherwise, we got some urls and filenames
+            my_response["status_code"] = 200
+
+        return my_response
+
     # This is for a single word
-    def fetch_pronunciations(self, word):
+    def fetch_pronunciations(
+        self, word, language=FORVO_LANGUAGE, selector=None, api_key=FORVO_API_KEY
+    ):
         encoded_word = self.encode(word)
-        url = self.make_url(encoded_word)
+        url = self.make_url(encoded_word, language, api_key)
 
         my_response = {
             "word": word,
+            "language": language,
             "data": [],
+            "raw": None,
             "status_code": None,
             "other_error": False,
             "rate_limit_exceeded": False,
@@ -112,15 +220,9 @@ class ForvoManager:
                         return my_response
 
                     # set 'data' to the a filename-and-url list
-                    my_response["data"] = self.filename_and_url_from_data(data, word)
-
-                    if not my_response["data"]:
-                        # If that came back empty, we have no data
-                        logger.warning(f"No pronunciations found for '{word}'.")
-                        my_response["status_code"] = 204
-                    else:
-                        # Otherwise, we got some urls and filenames
-                        my_response["status_code"] = 200
+                    my_response.update(
+                        self.response_from_data(data, word, language, selector)
+                    )
 
                     return my_response
 
@@ -166,6 +268,7 @@ class ForvoManager:
                     return my_response
 
                 else:
+                    my_response["status_code"] = response.status_code
                     try:
                         my_response["message"] = response.json()
                     except ValueError:
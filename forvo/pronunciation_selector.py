@@ -0,0 +1,113 @@
+import json
+import re
+
+from config.logger import logger
+
+# Settings used for decks without their own entry in the selection config
+DEFAULT_SELECTION = {
+    "top_k": None,  # Keep every pronunciation
+    "preferred_sex": None,  # "m" or "f"
+    "preferred_countries": [],  # e.g. ["Ireland"]
+    "allow_users": [],  # Usernames ranked above everyone else
+    "deny_users": [],  # Usernames never downloaded
+}
+
+
+def int_field(item, field):
+    try:
+        return int(item.get(field) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class PronunciationSelector:
+    def __init__(
+        self,
+        top_k=None,
+        preferred_sex=None,
+        preferred_countries=None,
+        allow_users=None,
+        deny_users=None,
+    ) -> None:
+        """
+        Rank Forvo pronunciation items using the metadata Forvo returns with them,
+        and keep only the best `top_k`.
+        """
+        if top_k is not None and top_k < 1:
+            raise ValueError(f"Invalid top_k {top_k}: keep at least 1 pronunciation.")
+        self.top_k = top_k
+        self.preferred_sex = preferred_sex
+        self.preferred_countries = {c.lower() for c in preferred_countries or []}
+        self.allow_users = {u.lower() for u in allow_users or []}
+        self.deny_users = {u.lower() for u in deny_users or []}
+
+    def __repr__(self):
+        return f"PronunciationSelector(top_k={self.top_k!r})"
+
+    def is_denied(self, item):
+        return (item.get("username") or "").lower() in self.deny_users
+
+    def rank_key(self, item):
+        """
+        Sort key, best first: allow-listed users, then preferred countries,
+        then rating (positive minus negative votes), preferred sex and hits.
+        """
+        return (
+            (item.get("username") or "").lower() in self.allow_users,
+            (item.get("country") or "").lower() in self.preferred_countries,
+            int_field(item, "rate"),
+            int_field(item, "num_positive_votes"),
+            bool(self.preferred_sex) and item.get("sex") == self.preferred_sex,
+            int_field(item, "hits"),
+        )
+
+    def rank(self, items):
+        # sorted() is stable, so ties keep Forvo's order
+        return sorted(
+            (item for item in items if not self.is_denied(item)),
+            key=self.rank_key,
+            reverse=True,
+        )
+
+    def select(self, items):
+        ranked = self.rank(items)
+        if self.top_k is not None:
+            ranked = ranked[: self.top_k]
+        logger.debug(f"Selected {len(ranked)} of {len(items)} pronunciations.")
+        return ranked
+
+
+def load_selection_config(path):
+    """
+    Load per-deck selection settings from a JSON file shaped like:
+
+        {"default": {"top_k": 3}, "decks": {"Irish": {"preferred_countries": ["Ireland"]}}}
+
+    Returns:
+        dict: The parsed config, or an empty config if no path is given.
+    """
+    if not path:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def deck_from_query(query):
+    """Extract the deck name from an Anki search such as 'deck:"Irish" tag:verb'."""
+    match = re.search(r'deck:(?:"([^"]+)"|(\S+))', query or "")
+    if match:
+        return match.group(1) or match.group(2)
+    return None
+
+
+def selector_for_deck(config, deck, top_k=None):
+    """
+    Build the selector for a deck: DEFAULT_SELECTION, overridden by the config's
+    "default" entry, then by the deck's entry, then by an explicit `top_k`.
+    """
+    settings = dict(DEFAULT_SELECTION)
+    settings.update(config.get("default", {}))
+    settings.update(config.get("decks", {}).get(deck, {}))
+    if top_k is not None:
+        settings["top_k"] = top_k
+    return PronunciationSelector(**settings)
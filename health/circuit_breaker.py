@@ -0,0 +1,85 @@
+import time
+
+from config.logger import logger
+
+# Constants for circuit breakers
+FAILURE_THRESHOLD = 3  # Consecutive failures that open the circuit
+RESET_TIMEOUT = 30  # Seconds an open circuit waits before probing the upstream
+MAX_RESET_TIMEOUT = 600  # Cap for the doubling wait between failed probes
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name,
+        probe=None,
+        failure_threshold=FAILURE_THRESHOLD,
+        reset_timeout=RESET_TIMEOUT,
+    ) -> None:
+        """
+        Stop calling an upstream after `failure_threshold` consecutive failures.
+        While the circuit is open, calls are refused without touching the network;
+        once the wait is over, `probe` (a cheap health check returning a bool)
+        decides whether to close it. Without a probe, the next call is let
+        through as the trial. The wait doubles with every failed probe.
+        """
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None  # time.monotonic() when opened, or None if closed
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        """
+        Returns:
+            bool: Whether a call to the upstream should be made now.
+        """
+        if not self.is_open:
+            return True
+        if time.monotonic() - self.opened_at < self.timeout:
+            return False
+        if self.probe is None:
+            # Let one trial call through; its result closes or re-opens the circuit
+            self.opened_at = time.monotonic()
+            return True
+        if self.probe():
+            self.close()
+            return True
+        self.trip()
+        return False
+
+    def record_success(self):
+        if self.is_open or self.failures:
+            self.close()
+
+    def record_failure(self):
+        self.failures += 1
+        if self.is_open or self.failures >= self.failure_threshold:
+            self.trip()
+
+    def record_result(self, ok):
+        if ok:
+            self.record_success()
+        else:
+            self.record_failure()
+
+    def trip(self):
+        if self.is_open:
+            self.timeout = min(self.timeout * 2, MAX_RESET_TIMEOUT)
+        self.opened_at = time.monotonic()
+        logger.warning(
+            f"{self.name} is unavailable. Circuit open; next check in {self.timeout}s."
+        )
+
+    def close(self):
+        if self.is_open:
+            logger.info(f"{self.name} is available again. Circuit closed.")
+        self.failures = 0
+        self.opened_at = None
+        self.timeout = self.reset_timeout
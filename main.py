@@ -1,14 +1,53 @@
 import argparse
-from datetime import datetime
+import os
 import sys
 
+import requests
+
+from anki.anki_invoker import AnkiInvoker
 from anki.anki_note_card_manager import AnkiNoteManager
 from anki.anki_file_manager import AnkiFileManager
+from audio.audio_processor import (
+    AUDIO_FORMATS,
+    DEFAULT_AUDIO_CACHE_DIR,
+    DEFAULT_AUDIO_FORMAT,
+    AudioProcessor,
+)
 from backup.backup_manager import BackupManager
 from cache.cache_manager import CacheManager
-from config.config import ANKI_CONNECT_URL, CACHE_FILE, DEFAULT_QUERY, RETRY_AFTER_DAYS
+from cache.response_cache import (
+    DEFAULT_RESPONSE_CACHE_FILE,
+    DEFAULT_RESPONSE_TTL_DAYS,
+    ResponseCache,
+)
+from config.config import (
+    ANKI_CONNECT_URL,
+    CACHE_FILE,
+    DEFAULT_QUERY,
+    FORVO_API_KEY,
+    FORVO_LANGUAGE,
+    MEDIA_DIR,
+    RETRY_AFTER_DAYS,
+)
 from config.logger import logger
+from export.media_bundle import MediaBundle
+from export.note_import_writer import NoteImportWriter
+from forvo.api_key_pool import ApiKeyPool
 from forvo.forvo_manager import ForvoManager
+from forvo.pronunciation_selector import load_selection_config, selector_for_deck
+from health.circuit_breaker import CircuitBreaker
+from pipeline.job import DEFAULT_TARGET_FIELD, Job
+from pipeline.planner import RunPlanner
+from pipeline.pronunciation_pipeline import PronunciationPipeline
+from pipeline.watcher import (
+    DEFAULT_FLUSH_INTERVAL,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_RESCAN_INTERVAL,
+    Watcher,
+)
+from profiling.profiler import add_profiling_args, profiler_from_args
+from spool.spool_manager import DEFAULT_SPOOL_FILE, SpoolManager
+from words.word_normalizer import CASE_FOLD, WordNormalizer
 
 
 def parse_local_args():
@@ -21,34 +60,297 @@ def parse_local_args():
         default=DEFAULT_QUERY,
         help='Anki search query (default: deck:"Default")',
     )
+    parser.add_argument(
+        "--job",
+        nargs=3,
+        action="append",
+        default=[],
+        metavar=("QUERY", "LANGUAGE", "FIELD"),
+        help="Fetch pronunciations in LANGUAGE for notes matching QUERY into FIELD (repeatable; overrides --query)",
+    )
     parser.add_argument(
         "--retry-after-days",
         type=int,
         default=RETRY_AFTER_DAYS,
-        help="Number of days to wait before retrying a failed word (default: 30)",
+        help="Initial number of days to wait before retrying a failed word; doubles with every failed attempt (default: 30)",
+    )
+    parser.add_argument(
+        "--recheck-search",
+        type=str,
+        action="append",
+        default=[],
+        help="Ask Forvo which words matching this search are pronounced and retry those failed words now (costs one request per search and language; repeatable)",
+    )
+    parser.add_argument(
+        "--api-key",
+        type=str,
+        action="append",
+        default=[],
+        help="Forvo API key to use; repeat to spread requests over several keys, each with its own daily limit (default: FORVO_API_KEY)",
+    )
+    parser.add_argument(
+        "--case-sensitive",
+        action="store_true",
+        default=not CASE_FOLD,
+        help='Treat words differing only in case (e.g. "Aoine" and "aoine") as different words',
+    )
+    parser.add_argument(
+        "--migrate-cache",
+        action="store_true",
+        help="Re-key the cache with normalized words, merging duplicate entries, before fetching (done automatically when the normalization settings change)",
+    )
+    parser.add_argument(
+        "--selection-config",
+        type=str,
+        default=None,
+        help="JSON file with per-deck ranking settings (top_k, preferred_sex, preferred_countries, allow_users, deny_users)",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=positive_int,
+        default=None,
+        help="Download only the K best-ranked pronunciations per word (overrides --selection-config)",
+    )
+    parser.add_argument(
+        "--prune-extras",
+        action="store_true",
+        help="Before fetching, remove cached pronunciations beyond each deck's top_k from notes, cache and media",
+    )
+    parser.add_argument(
+        "--response-cache",
+        type=str,
+        default=DEFAULT_RESPONSE_CACHE_FILE,
+        help=f"SQLite file storing raw Forvo responses; empty to disable (default: {DEFAULT_RESPONSE_CACHE_FILE})",
+    )
+    parser.add_argument(
+        "--response-ttl-days",
+        type=int,
+        default=DEFAULT_RESPONSE_TTL_DAYS,
+        help=f"Days raw Forvo responses are served and kept (default: {DEFAULT_RESPONSE_TTL_DAYS})",
+    )
+    parser.add_argument(
+        "--rebuild-from-raw",
+        action="store_true",
+        help="Before fetching, rebuild pronunciations and note fields from the raw responses without querying Forvo",
+    )
+    parser.add_argument(
+        "--spool-file",
+        type=str,
+        default=DEFAULT_SPOOL_FILE,
+        help=f"SQLite file buffering fetched recordings while AnkiConnect is unavailable; empty to stop fetching instead (default: {DEFAULT_SPOOL_FILE})",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Only estimate the run: words to fetch, Forvo calls against the remaining quota, AnkiConnect actions and duration. Nothing is fetched, written to Anki or saved",
+    )
+    parser.add_argument(
+        "--bulk-export",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help="Offline bulk mode: download recordings into DIR/media and write the note updates as Anki text import files in DIR, instead of storing and updating each note through AnkiConnect",
+    )
+    parser.add_argument(
+        "--bulk-media-dir",
+        type=str,
+        default=None,
+        help="Where --bulk-export puts the recordings, e.g. Anki's collection.media folder while Anki is closed (default: DIR/media)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and fetch pronunciations for notes as they are added or edited",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help=f"Seconds between AnkiConnect polls in watch mode (default: {DEFAULT_POLL_INTERVAL})",
+    )
+    parser.add_argument(
+        "--flush-interval",
+        type=float,
+        default=DEFAULT_FLUSH_INTERVAL,
+        help=f"Seconds between cache saves in watch mode (default: {DEFAULT_FLUSH_INTERVAL})",
+    )
+    parser.add_argument(
+        "--rescan-interval",
+        type=float,
+        default=DEFAULT_RESCAN_INTERVAL,
+        help=f"Seconds between retries of due failed words in watch mode (default: {DEFAULT_RESCAN_INTERVAL})",
+    )
+    parser.add_argument(
+        "--process-audio",
+        action="store_true",
+        help="Trim silence, normalize loudness and transcode recordings with ffmpeg before storing them",
+    )
+    parser.add_argument(
+        "--audio-format",
+        choices=sorted(AUDIO_FORMATS),
+        default=DEFAULT_AUDIO_FORMAT,
+        help=f"Format of processed recordings (default: {DEFAULT_AUDIO_FORMAT})",
+    )
+    parser.add_argument(
+        "--audio-workers",
+        type=int,
+        default=None,
+        help="Number of audio processing worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        metavar="INDEX/COUNT",
+        help="Run as worker INDEX (0-based) of COUNT processes splitting the same jobs and quota, e.g. 0/2",
     )
+    add_profiling_args(parser)
     args = parser.parse_args()
-    search_query = args.query
-    retry_after_days = args.retry_after_days
-    return search_query, retry_after_days
+    if args.bulk_export and args.watch:
+        parser.error("--bulk-export cannot be combined with --watch.")
+    return args
+
+
+def positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a whole number, got '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def parse_shard(shard):
+    try:
+        index, count = (int(part) for part in shard.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected INDEX/COUNT, got '{shard}'")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(
+            f"invalid shard '{shard}': INDEX must be below COUNT"
+        )
+    return index, count
+
+
+def jobs_from_args(args):
+    if args.job:
+        jobs = [Job(query, language, field) for query, language, field in args.job]
+    else:
+        jobs = [Job(args.query, FORVO_LANGUAGE, DEFAULT_TARGET_FIELD)]
+
+    selection_config = load_selection_config(args.selection_config)
+    for job in jobs:
+        job.selector = selector_for_deck(selection_config, job.deck, args.top_k)
+    return jobs
 
 
 def main():
 
-    # Initialize managers
+    # Parse command-line arguments for the jobs and retry configuration
+    args = parse_local_args()
+    with profiler_from_args(args) as profiler:
+        run(args, profiler)
+
+
+def run(args, profiler):
+    jobs = jobs_from_args(args)
+    logger.info(f"Jobs: {jobs}, retry after days: {args.retry_after_days}")
+
+    # Initialize managers, sharing one connection pool per upstream
+    # and one word normalizer for cache keys
+    normalizer = WordNormalizer(case_fold=not args.case_sensitive)
     backup = BackupManager()
-    cache_manager = CacheManager(CACHE_FILE, 500, 30)
-    forvo = ForvoManager()
-    anki_note_card_manager = AnkiNoteManager(ANKI_CONNECT_URL)
-    anki_file_manager = AnkiFileManager(ANKI_CONNECT_URL)
+    cache_manager = CacheManager(
+        CACHE_FILE,
+        500,
+        args.retry_after_days,
+        default_language=FORVO_LANGUAGE,
+        autosave=not (args.watch or args.plan),
+        normalizer=normalizer,
+        read_only=args.plan,
+    )
+    forvo = ForvoManager(requests.Session())
+    key_pool = ApiKeyPool(args.api_key or [FORVO_API_KEY], cache_manager)
+    # A plan only reads: it opens an existing response cache but creates no
+    # files, spool, export bundle or audio workers
+    response_cache = (
+        ResponseCache(args.response_cache, args.response_ttl_days)
+        if args.response_cache
+        and (not args.plan or os.path.exists(args.response_cache))
+        else None
+    )
+    spool = (
+        SpoolManager(args.spool_file) if args.spool_file and not args.plan else None
+    )
+    # One circuit breaker per upstream, probed with cheap health checks
+    forvo_breaker = CircuitBreaker("Forvo", forvo.ping)
+    anki_session = requests.Session()
+    anki_breaker = CircuitBreaker(
+        "AnkiConnect", AnkiInvoker(ANKI_CONNECT_URL, anki_session).ping
+    )
+    anki_note_card_manager = AnkiNoteManager(
+        ANKI_CONNECT_URL, anki_session, anki_breaker
+    )
+    anki_file_manager = AnkiFileManager(ANKI_CONNECT_URL, anki_session, anki_breaker)
+    import_writer = None
+    if args.bulk_export and not args.plan:
+        # Notes are still read over AnkiConnect, but recordings and note updates
+        # go to a bundle that Anki imports in one operation
+        import_writer = NoteImportWriter(anki_note_card_manager)
+        anki_note_card_manager = import_writer
+        anki_file_manager = MediaBundle(
+            args.bulk_media_dir or os.path.join(args.bulk_export, "media"),
+            forvo.session,
+            MEDIA_DIR,
+            anki_file_manager,
+        )
+    audio_processor = (
+        AudioProcessor(
+            DEFAULT_AUDIO_CACHE_DIR,
+            args.audio_format,
+            args.audio_workers,
+            forvo.session,
+        )
+        if args.process_audio and not args.plan
+        else None
+    )
+    pipeline = PronunciationPipeline(
+        cache_manager,
+        forvo,
+        anki_note_card_manager,
+        anki_file_manager,
+        audio_processor,
+        args.shard,
+        key_pool,
+        response_cache,
+        profiler,
+        forvo_breaker,
+        anki_breaker,
+        spool,
+    )
+
+    if args.plan:
+        # Everything below only changes the cache in memory, which is never saved
+        if cache_manager.needs_migration():
+            cache_manager.migrate_keys()
+        cache_manager.reset_request_count_if_new_day()
+        try:
+            planner = RunPlanner(pipeline)
+            planner.log_plan(planner.plan(jobs))
+        finally:
+            if response_cache:
+                response_cache.close()
+        return
 
     # Backup cache
     backup.limit_backups()
     backup.backup_cache()
 
-    # Parse command-line arguments for the search query and retry configuration
-    search_query, retry_after_days = parse_local_args()
-    logger.info(search_query, retry_after_days)
+    # Caches written before normalization (or with other settings) are re-keyed
+    # once, so existing entries aren't fetched again under their canonical key
+    if args.migrate_cache or cache_manager.needs_migration():
+        cache_manager.migrate_keys()
 
     # Reset the request count if it's after 22:00 UTC (time set by Forvo)
     # We do this before checking the limit itself because ... logic.
@@ -56,122 +358,57 @@ def main():
 
     ### Check request limit
     ### BAIL COMPLETELY if reached
-    if cache_manager.is_request_limit():
+    # (A bulk export still writes the words that are already cached)
+    if pipeline.is_request_limit() and not (args.watch or args.bulk_export):
         logger.warning(f"Stopping, request limit reached.")
         logger.warning("Request limit will be reset at 22:00 UTC")
         sys.exit()
 
-    # Get the notes corresponding to our search query
-    notes = anki_note_card_manager.notes_from_query(search_query)
-
-    # filter notes by those with a "Word" field.
-    # Get the value of the Word field (aka the word itself)
-    filtered_words = [
-        note["fields"]["Word"]["value"]
-        for note in notes
-        if note.get("fields", {}).get("Word", {}.get("value"))
-    ]
-    logger.info("Filtered words:", len(filtered_words))
-
-    # # Check if the word is in failed_words
-    # if cache.is_failed_word(word) and not cache.can_reattempt(word):
-    #     logging.info(f"Skipping word '{word}'.")
-    #     continue  # Skip this word
-    can_attempt_words = [
-        word
-        for word in filtered_words
-        if
-        # it doesn't have any pronunciations and it doesn't have any failues
-        (
-            (not cache_manager.in_pronunciations(word))
-            and (not cache_manager.in_failures(word))
-        )
-        # or it has failed, but we can reattempt
-        or (cache_manager.in_failures(word) and cache_manager.can_reattempt(word))
-    ]
-
-    try:
-        for word in can_attempt_words:
-
-            # Check request limit
-            # BAIL COMPLETELY if reached
-            # (We do this again here because the request increment after every word.)
-            if cache_manager.is_request_limit():
-                logger.warning(f"Request limit reached. Bailing")
+    # Invalidate failed words that Forvo now lists as pronounced
+    languages = sorted({job.language for job in jobs})
+    for search in args.recheck_search:
+        for language in languages:
+            acquired = key_pool.acquire()
+            if not acquired:
                 break
-
-            ########################
-            ### FETCH PRONUNCIATIONS
-            ########################
-
-            logger.info(f"Fetching and storing pronunciations for word: '{word}'")
-            response = forvo.fetch_pronunciations(word)
-
-            filenames = []
-
-            if response is None:
-                logger.error("Something went wrong. Bailing.")
-                break
-            elif response["status_code"] == 400:
-                logger.warning(f"Request limit reached. Bailing.")
-                cache_manager.set_request_count_to_limit()
-                break
-            elif response["status_code"] == 200 and response["data"]:
-                cache_manager.increment_request_count()
-                logger.info(f"Successful fetch for: {word}")
-                for item in response["data"]:
-                    cache_manager.increment_request_count()
-                    # Store the media file and get the filename
-                    stored_filename = anki_file_manager.store_media_file(
-                        item["filename"],
-                        item["url"],  # format: {"filename": filename, "url": mp3_url}
-                    )
-                    # Keep a string of the filenames for updating the anki note
-                    if stored_filename:
-                        filenames.append(
-                            f"sound:{stored_filename}"
-                        )  # (We've removed the brackets from [sound:X] to prevent auto-play on cards)
-            elif response["status_code"] == 204:
-                # We received a response, but no pronunciations were available
-                cache_manager.increment_request_count()
-                logger.debug(f"{word}: 204")
-
-            ########################
-            ### Update Anki Cards
-            ########################
-
-            query = f'Word:"{word}"'
-            notes = anki_note_card_manager.notes_from_query(query)
-
-            for note in notes:
-
-                note_field = "ForvoPronunciations" if filenames else "ForvoChecked"
-                note_data = (
-                    " ".join(filenames)
-                    if filenames
-                    else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            pronounced_words = forvo.fetch_pronounced_words(
+                search, language, acquired[1]
+            )
+            if pronounced_words:
+                cache_manager.invalidate_failures(
+                    cache_manager.key(word, language) for word in pronounced_words
                 )
 
-                anki_note_card_manager.update_note_field(
-                    note["noteId"], note_field, note_data
-                )
+    if response_cache:
+        response_cache.evict()
 
-            ########################
-            ### Update Cache
-            ########################
-
-            cache_manager.set_last_attempt(word)
-            if filenames:
-                cache_manager.set_pronunciations(word, filenames)
-                if cache_manager.in_failures(word):
-                    cache_manager.set_unfailed(word)
-            else:
-                cache_manager.increment_fetch_failure(
-                    word, cache_manager.get_204_error_string()
-                )
+    if args.rebuild_from_raw or args.prune_extras:
+        pipeline.prepare(jobs)
+    if args.rebuild_from_raw:
+        pipeline.rebuild_from_raw(jobs)
+    if args.prune_extras:
+        pipeline.prune_extras(jobs)
 
-    except:
-        logger.exception("Exception")
+    try:
+        if args.watch:
+            Watcher(
+                pipeline,
+                jobs,
+                args.poll_interval,
+                args.flush_interval,
+                args.rescan_interval,
+            ).run()
+        else:
+            pipeline.run(jobs)
+        if import_writer:
+            import_writer.write(args.bulk_export)
+    finally:
+        if audio_processor:
+            audio_processor.shutdown()
+        if response_cache:
+            response_cache.close()
+        if spool is not None:
+            spool.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,40 @@
+from config.config import FORVO_LANGUAGE
+from forvo.pronunciation_selector import deck_from_query
+
+DEFAULT_TARGET_FIELD = "ForvoPronunciations"
+
+
+class Job:
+    def __init__(self, query, language=FORVO_LANGUAGE, field=DEFAULT_TARGET_FIELD):
+        """
+        A unit of work: fetch pronunciations in `language` for the notes matching
+        the Anki search `query`, and store them in the note field `field`.
+        """
+        self.query = query
+        self.language = language
+        self.field = field
+        self.deck = deck_from_query(query)
+        self.selector = None  # PronunciationSelector for this job's deck
+        self.notes_by_word = {}  # word: [notes]
+        self.surface_words = {}  # word: first spelling seen on a note, for Forvo
+        self.words = []  # candidate words, in the order they should be fetched
+
+    def __repr__(self):
+        return f"Job(query={self.query!r}, language={self.language!r}, field={self.field!r})"
+
+
+def interleave_jobs(jobs):
+    """
+    Yield (job, word) pairs, taking one candidate word from each job in turn so
+    that a large deck can't starve the others of the shared daily quota.
+    """
+    iterators = [(job, iter(job.words)) for job in jobs]
+    while iterators:
+        remaining = []
+        for job, words in iterators:
+            word = next(words, None)
+            if word is None:
+                continue
+            remaining.append((job, words))
+            yield job, word
+        iterators = remaining
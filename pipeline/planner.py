@@ -0,0 +1,171 @@
+import math
+from datetime import timedelta
+
+from anki.anki_note_card_manager import NOTE_UPDATE_BATCH_SIZE
+from config.logger import logger
+
+# Latencies (seconds) assumed until a run has measured them
+DEFAULT_LATENCIES = {
+    "forvo": 0.5,
+    "store_media": 0.5,
+    "update_note": 0.05,
+    "update_notes_batch": 0.5,
+}
+
+
+class RunPlanner:
+    def __init__(self, pipeline) -> None:
+        """
+        Estimate what a run of `pipeline` would cost, without calling Forvo or
+        writing to Anki.
+        """
+        self.pipeline = pipeline
+        self.cache_manager = pipeline.cache_manager
+
+    def latency(self, upstream):
+        return self.cache_manager.get_latency(upstream, DEFAULT_LATENCIES[upstream])
+
+    def average_pronunciations(self):
+        """Average number of stored recordings per cached word."""
+        pronunciations = self.cache_manager.get_all_pronunciations()
+        if not pronunciations:
+            return 1.0
+        return sum(len(f) for f in pronunciations.values()) / len(pronunciations)
+
+    def success_rate(self):
+        """Share of attempted words that had pronunciations, from the cache so far."""
+        found = len(self.cache_manager.get_all_pronunciations())
+        not_found = sum(
+            1
+            for details in self.cache_manager.get_failed_words().values()
+            if not details.get("transient")
+        )
+        if not found + not_found:
+            return 1.0
+        return found / (found + not_found)
+
+    def plan(self, jobs):
+        """
+        Returns:
+            dict: Word counts, predicted requests and AnkiConnect actions, and
+            the estimated duration of the run.
+        """
+        pipeline = self.pipeline
+        cache_manager = self.cache_manager
+
+        counts = {
+            "words": 0,
+            "new": 0,
+            "retry_due": 0,
+            "retry_later": 0,
+            "other_shard": 0,
+            "done": 0,
+            "cache_fill_notes": 0,
+            "raw_cache_hits": 0,
+        }
+        fetch_notes = 0
+        seen = set()
+
+        for job in jobs:
+            pipeline.index_notes(job)
+            for word, notes in job.notes_by_word.items():
+                key = cache_manager.key(word, job.language)
+                filenames = cache_manager.get_pronunciations(key)
+
+                if filenames:
+                    note_data = " ".join(filenames)
+                    counts["cache_fill_notes"] += sum(
+                        1
+                        for note in notes
+                        if job.field in note.get("fields", {})
+                        and note["fields"][job.field].get("value") != note_data
+                    )
+
+                if key in seen:
+                    continue
+                seen.add(key)
+                counts["words"] += 1
+
+                if not pipeline.in_shard(key):
+                    counts["other_shard"] += 1
+                    continue
+                if filenames:
+                    counts["done"] += 1
+                    continue
+                if cache_manager.in_failures(key):
+                    if not cache_manager.can_reattempt(key):
+                        counts["retry_later"] += 1
+                        continue
+                    counts["retry_due"] += 1
+                else:
+                    counts["new"] += 1
+
+                fetch_notes += len(notes)
+                raw = (
+                    pipeline.response_cache.get(key)
+                    if pipeline.response_cache
+                    else None
+                )
+                if raw and raw.get("items"):
+                    counts["raw_cache_hits"] += 1
+
+        to_fetch = counts["new"] + counts["retry_due"]
+        forvo_calls = to_fetch - counts["raw_cache_hits"]
+        remaining = pipeline.key_pool.total_remaining()
+        daily_capacity = cache_manager.request_limit * len(pipeline.key_pool.keys)
+
+        # Only the words that fit into today's quota are processed by this run
+        fetched = min(to_fetch, remaining + counts["raw_cache_hits"])
+        share = fetched / to_fetch if to_fetch else 0
+        success_rate = self.success_rate()
+        store_media = round(fetched * success_rate * self.average_pronunciations())
+        note_updates = round(fetch_notes * share)
+        fill_batches = math.ceil(counts["cache_fill_notes"] / NOTE_UPDATE_BATCH_SIZE)
+
+        seconds = (
+            min(forvo_calls, remaining) * self.latency("forvo")
+            + store_media * self.latency("store_media")
+            + note_updates * self.latency("update_note")
+            + fill_batches * self.latency("update_notes_batch")
+        )
+
+        return dict(
+            counts,
+            forvo_calls=forvo_calls,
+            remaining_quota=remaining,
+            calls_deferred=max(forvo_calls - remaining, 0),
+            days_needed=math.ceil(forvo_calls / daily_capacity) if daily_capacity else None,
+            success_rate=round(success_rate, 3),
+            anki_store_media=store_media,
+            anki_note_updates=note_updates,
+            anki_fill_batches=fill_batches,
+            estimated_seconds=round(seconds),
+        )
+
+    def log_plan(self, plan):
+        logger.info("Run plan (nothing has been fetched or written):")
+        logger.info(
+            f"  Words: {plan['words']} ({plan['new']} new, {plan['retry_due']} retry due, "
+            f"{plan['retry_later']} retry later, {plan['done']} done, "
+            f"{plan['other_shard']} in other shards)"
+        )
+        logger.info(
+            f"  Cache fill: {plan['cache_fill_notes']} notes in {plan['anki_fill_batches']} batches, no Forvo calls"
+        )
+        logger.info(
+            f"  Forvo calls: {plan['forvo_calls']} ({plan['raw_cache_hits']} more served from raw responses), "
+            f"{plan['remaining_quota']} requests left today"
+        )
+        if plan["calls_deferred"]:
+            logger.warning(
+                f"  {plan['calls_deferred']} calls exceed today's quota; "
+                f"the backlog needs about {plan['days_needed']} days."
+            )
+        logger.info(
+            f"  AnkiConnect: ~{plan['anki_store_media']} storeMediaFile, "
+            f"{plan['anki_note_updates']} updateNoteFields "
+            f"(expected success rate {plan['success_rate']:.0%})"
+        )
+        logger.info(
+            f"  Estimated duration: {timedelta(seconds=plan['estimated_seconds'])}"
+        )
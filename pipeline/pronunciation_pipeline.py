@@ -0,0 +1,716 @@
+from datetime import datetime
+import math
+import time
+import zlib
+
+from config.config import FORVO_API_KEY
+from anki.anki_note_card_manager import NOTE_UPDATE_BATCH_SIZE
+from config.logger import logger
+from forvo.api_key_pool import ApiKeyPool
+from health.circuit_breaker import CircuitBreaker
+from pipeline.job import interleave_jobs
+from profiling.profiler import Profiler
+
+WORD_FIELD = "Word"  # Note field holding the word to look up
+CHECKED_FIELD = "ForvoChecked"  # Note field stamped when Forvo has no pronunciations
+
+
+def sound_filename(sound_ref):
+    """Media filename of a cached ref such as "sound:aill_x_m_1.mp3" or "[sound:...]"."""
+    return sound_ref.strip("[]").removeprefix("sound:")
+
+
+class PronunciationPipeline:
+    def __init__(
+        self,
+        cache_manager,
+        forvo,
+        anki_note_card_manager,
+        anki_file_manager,
+        audio_processor=None,
+        shard=None,
+        key_pool=None,
+        response_cache=None,
+        profiler=None,
+        forvo_breaker=None,
+        anki_breaker=None,
+        spool=None,
+    ) -> None:
+        """
+        Fetch pronunciations for one or more jobs, sharing the cache, the daily
+        quota and the HTTP sessions of the given managers.
+
+        If an `audio_processor` is given, recordings are trimmed, normalized and
+        transcoded before they are stored in Anki.
+
+        `shard` is an (index, count) pair: this process only fetches the words
+        whose cache key hashes to `index`, so `count` processes can split a deck.
+
+        `profiler` is told about stage boundaries (notes loaded, candidates
+        selected) so memory can be snapshotted there.
+
+        `forvo_breaker` and `anki_breaker` track the health of each upstream:
+        fetching stops while Forvo is down, and while AnkiConnect is down fetched
+        recordings go to the `spool` and are stored once it is back.
+        """
+        self.cache_manager = cache_manager
+        self.forvo = forvo
+        self.anki_note_card_manager = anki_note_card_manager
+        self.anki_file_manager = anki_file_manager
+        self.audio_processor = audio_processor
+        self.shard = shard
+        self.key_pool = key_pool or ApiKeyPool([FORVO_API_KEY], cache_manager)
+        self.response_cache = response_cache
+        self.profiler = profiler or Profiler()
+        self.forvo_breaker = forvo_breaker or CircuitBreaker("Forvo")
+        self.anki_breaker = anki_breaker or CircuitBreaker("AnkiConnect")
+        self.spool = spool
+        self.notes_by_query = {}  # query: [notes], so jobs sharing a query load once
+        self.attempted = set()  # cache keys attempted during this run
+        # (job, word, key, items, pending) whose recordings are being post-processed
+        self.pending_audio = []
+
+    def load_notes(self, query):
+        if query not in self.notes_by_query:
+            self.notes_by_query[query] = self.anki_note_card_manager.notes_from_query(
+                query
+            )
+        return self.notes_by_query[query]
+
+    def index_note(self, job, note):
+        """
+        Add a note to the job's index under the canonical form of its Word
+        field, so that all notes for the same word share one fetch.
+        """
+        normalizer = self.cache_manager.normalizer
+        value = note.get("fields", {}).get(WORD_FIELD, {}).get("value")
+        word = normalizer.normalize(value)
+        if word:
+            job.notes_by_word.setdefault(word, []).append(note)
+            job.surface_words.setdefault(word, normalizer.clean(value))
+        return word
+
+    def unindex_note(self, job, note_id):
+        """Remove a note from the job's index, e.g. before re-adding an edited note."""
+        for word, notes in list(job.notes_by_word.items()):
+            notes[:] = [note for note in notes if note["noteId"] != note_id]
+            if not notes:
+                del job.notes_by_word[word]
+                job.surface_words.pop(word, None)
+
+    def index_notes(self, job):
+        """Group the job's notes by the value of their Word field."""
+        job.notes_by_word = {}
+        job.surface_words = {}
+        for note in self.load_notes(job.query):
+            self.index_note(job, note)
+        logger.info(f"{job}: {len(job.notes_by_word)} words.")
+        return job.notes_by_word
+
+    def in_shard(self, key):
+        if not self.shard:
+            return True
+        index, count = self.shard
+        return zlib.crc32(key.encode("utf-8")) % count == index
+
+    def can_attempt(self, key):
+        cache_manager = self.cache_manager
+        if not self.in_shard(key):
+            return False
+        # Already fetched, waiting in the spool to be stored
+        if self.spool is not None and key in self.spool:
+            return False
+        return (
+            # it doesn't have any pronunciations and it doesn't have any failues
+            (
+                (not cache_manager.in_pronunciations(key))
+                and (not cache_manager.in_failures(key))
+            )
+            # or it has failed, but we can reattempt
+            or (cache_manager.in_failures(key) and cache_manager.can_reattempt(key))
+        )
+
+    def select_candidates(self, job):
+        job.words = [
+            word
+            for word in job.notes_by_word
+            if self.can_attempt(self.cache_manager.key(word, job.language))
+        ]
+        logger.info(f"{job}: {len(job.words)} words to fetch.")
+        return job.words
+
+    def prepare(self, jobs):
+        for job in jobs:
+            self.index_notes(job)
+        self.profiler.stage("notes_loaded")
+        self.fill_from_cache(jobs)
+        for job in jobs:
+            self.select_candidates(job)
+        self.profiler.stage("candidates_selected")
+
+    def fill_from_cache(self, jobs):
+        """
+        Write cached pronunciations to notes whose field is empty or stale, in
+        batched AnkiConnect updates and without any Forvo requests. Words whose
+        media files are missing from Anki are dropped from the cache, so the
+        fetch stage downloads them again.
+
+        Returns:
+            int: The number of notes updated.
+        """
+        cache_manager = self.cache_manager
+        media_files = None
+        missing_keys = set()
+        updates = []
+        pending = {}  # noteId: [(note, field, value)] to mirror once Anki accepts it
+
+        for job in jobs:
+            for word, notes in job.notes_by_word.items():
+                key = cache_manager.key(word, job.language)
+                filenames = cache_manager.get_pronunciations(key)
+                if not filenames or key in missing_keys:
+                    continue
+
+                note_data = " ".join(filenames)
+                stale_notes = [
+                    note
+                    for note in notes
+                    if job.field in note.get("fields", {})
+                    and note["fields"][job.field].get("value") != note_data
+                ]
+                if not stale_notes:
+                    continue
+
+                # List Anki's media folder once, and only if there is work to do
+                if media_files is None:
+                    media_files = self.anki_file_manager.get_media_file_names()
+                    if media_files is None:
+                        logger.warning("Skipping cache fill: media files unavailable.")
+                        return 0
+
+                if any(sound_filename(f) not in media_files for f in filenames):
+                    logger.warning(f"Media files missing for '{key}'. Fetching again.")
+                    missing_keys.add(key)
+                    continue
+
+                for note in stale_notes:
+                    updates.append((note["noteId"], {job.field: note_data}))
+                    pending.setdefault(note["noteId"], []).append(
+                        (note, job.field, note_data)
+                    )
+
+        for key in missing_keys:
+            cache_manager.remove_pronunciations(key)
+
+        if not updates:
+            return 0
+        logger.info(f"Filling {len(updates)} notes from cached pronunciations.")
+        started = time.perf_counter()
+        updated = self.anki_note_card_manager.update_notes_fields(updates)
+        self.cache_manager.record_latency(
+            "update_notes_batch",
+            (time.perf_counter() - started)
+            / math.ceil(len(updates) / NOTE_UPDATE_BATCH_SIZE),
+        )
+        # Notes that failed to update stay stale in memory, so a later fill retries them
+        for note_id in set(updated):
+            for note, field, note_data in pending[note_id]:
+                note["fields"][field]["value"] = note_data
+        return len(updated)
+
+    def update_notes(self, job, word, filenames):
+        for note in job.notes_by_word.get(word, []):
+
+            note_field = job.field if filenames else CHECKED_FIELD
+            note_data = (
+                " ".join(filenames)
+                if filenames
+                else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            )
+
+            started = time.perf_counter()
+            updated = self.anki_note_card_manager.update_note_field(
+                note["noteId"], note_field, note_data
+            )
+            self.cache_manager.record_latency(
+                "update_note", time.perf_counter() - started
+            )
+            if not updated:
+                continue
+            # Keep the in-memory note in sync, so the cache fill sees it as current
+            note.setdefault("fields", {}).setdefault(note_field, {})[
+                "value"
+            ] = note_data
+
+    def fetch_response(self, job, word, key):
+        """
+        Get a word's Forvo response: from the raw response cache if it holds
+        pronunciations, otherwise from the API, reserving the request on the
+        key with the most remaining budget.
+
+        Returns:
+            dict: The response (status_code 400 once every key is exhausted),
+            or None if the request failed or Forvo is unavailable.
+        """
+        # Query Forvo with the word as spelled on the note, not its cache key
+        surface = job.surface_words.get(word, word)
+        raw = self.response_cache.get(key) if self.response_cache else None
+        if raw and raw.get("items"):
+            logger.info(f"Using cached Forvo response for '{word}'.")
+            return self.forvo.response_from_data(
+                raw, surface, job.language, job.selector
+            )
+
+        if not self.forvo_breaker.allow():
+            return None
+
+        while True:
+            # Reserve the request in the daily quota shared with other processes
+            acquired = self.key_pool.acquire()
+            if not acquired:
+                return {"status_code": 400, "data": [], "request_limit_reached": True}
+            key_id, api_key = acquired
+
+            started = time.perf_counter()
+            response = self.forvo.fetch_pronunciations(
+                surface, job.language, job.selector, api_key
+            )
+            self.cache_manager.record_latency("forvo", time.perf_counter() - started)
+            self.key_pool.record_result(key_id, response)
+            self.forvo_breaker.record_result(
+                response is not None and (response["status_code"] or 0) < 500
+            )
+
+            # Request limit reached for this key: fail over to the next one
+            if response is not None and response["status_code"] == 400:
+                self.key_pool.mark_exhausted(key_id)
+                continue
+            break
+
+        if response and response.get("raw") is not None and self.response_cache:
+            self.response_cache.put(key, surface, job.language, response["raw"])
+        return response
+
+    def store_items(self, items):
+        """
+        Post-process (if an audio processor is set) and store a word's recordings.
+
+        Returns:
+            list: "sound:filename" refs of the files that were stored.
+        """
+        if self.audio_processor:
+            items = self.audio_processor.process(items)
+        return self.store_media(items)
+
+    def store_media(self, items):
+        """
+        Store a word's recordings in Anki.
+
+        Returns:
+            list: "sound:filename" refs of the files that were stored.
+        """
+        filenames = []
+        for item in items:
+            # Store the media file and get the filename
+            started = time.perf_counter()
+            stored_filename = self.anki_file_manager.store_media_file(
+                item["filename"],
+                item.get("url"),  # format: {"filename": filename, "url": mp3_url}
+                item.get("path"),  # or a post-processed local file
+            )
+            self.cache_manager.record_latency(
+                "store_media", time.perf_counter() - started
+            )
+            # Keep a string of the filenames for updating the anki note
+            if stored_filename:
+                filenames.append(
+                    f"sound:{stored_filename}"
+                )  # (We've removed the brackets from [sound:X] to prevent auto-play on cards)
+        return filenames
+
+    def can_spool(self):
+        return self.spool is not None and self.anki_breaker.is_open
+
+    def spool_items(self, job, word, key, items):
+        self.spool.add(key, word, job.language, items)
+        self.attempted.add(key)
+        self.cache_manager.set_last_attempt(key)
+
+    def drain_spool(self, jobs):
+        """
+        Store the spooled recordings once AnkiConnect is available, then write
+        them to the notes in batched updates.
+
+        Returns:
+            int: The number of words drained from the spool.
+        """
+        if self.spool is None or not len(self.spool) or not self.anki_breaker.allow():
+            return 0
+
+        cache_manager = self.cache_manager
+        drained = 0
+        for entry in self.spool.entries():
+            key = entry["key"]
+            filenames = self.store_items(entry["items"])
+            if not filenames:
+                # AnkiConnect went away again: keep the rest for later
+                if self.anki_breaker.is_open:
+                    break
+                # AnkiConnect is up but refused the files: fetch the word again
+                self.spool.remove(key)
+                cache_manager.increment_fetch_failure(
+                    key, "Failed to store spooled media files.", transient=True
+                )
+                continue
+
+            self.spool.remove(key)
+            cache_manager.set_pronunciations(key, filenames)
+            if cache_manager.in_failures(key):
+                cache_manager.set_unfailed(key)
+            drained += 1
+
+        if drained:
+            logger.info(f"Stored {drained} spooled words in Anki.")
+            self.fill_from_cache(jobs)
+        return drained
+
+    def process_word(self, job, word):
+        """
+        Fetch, store and record the pronunciations of one word.
+
+        Returns:
+            bool: False if the run should stop.
+        """
+        cache_manager = self.cache_manager
+        key = cache_manager.key(word, job.language)
+
+        # Another job already handled this word during this run
+        if key in self.attempted:
+            filenames = cache_manager.get_pronunciations(key)
+            if filenames:
+                self.update_notes(job, word, filenames)
+            elif cache_manager.in_failures(key) and not (
+                cache_manager.get_failed_word_data(key).get("transient")
+            ):
+                # Forvo had no pronunciations: stamp this job's notes as checked too
+                self.update_notes(job, word, [])
+            return True
+
+        ########################
+        ### FETCH PRONUNCIATIONS
+        ########################
+
+        logger.info(
+            f"Fetching and storing pronunciations for word: '{word}' ({job.language})"
+        )
+        response = self.fetch_response(job, word, key)
+
+        filenames = []
+        transient_error = None
+
+        if response is None and self.forvo_breaker.is_open:
+            logger.warning("Forvo is unavailable. Stopping fetches.")
+            return False
+        elif response is None:
+            transient_error = "Forvo request failed."
+        elif response["status_code"] == 400:
+            logger.warning(f"Request limit reached. Bailing.")
+            return False
+        elif response["status_code"] == 200 and response["data"]:
+            logger.info(f"Successful fetch for: {word}")
+            # Don't store into a closed Anki; keep the recordings for later
+            if self.can_spool():
+                self.spool_items(job, word, key, response["data"])
+                return True
+            if self.audio_processor and self.audio_processor.enabled:
+                # Store once ffmpeg is done, fetching the next words meanwhile
+                self.attempted.add(key)
+                self.pending_audio.append(
+                    (
+                        job,
+                        word,
+                        key,
+                        response["data"],
+                        self.audio_processor.submit_items(response["data"]),
+                    )
+                )
+                return True
+            filenames = self.store_items(response["data"])
+            if not filenames and self.can_spool():
+                self.spool_items(job, word, key, response["data"])
+                return True
+            if not filenames:
+                transient_error = "Failed to store media files."
+        elif response["status_code"] == 204:
+            # We received a response, but no pronunciations were available
+            logger.debug(f"{word}: 204")
+        else:
+            # Rate limited, server or JSON error: re-check soon
+            transient_error = str(
+                response["message"] or f"Status {response['status_code']}"
+            )
+
+        self.record_word(job, word, key, filenames, transient_error)
+        return True
+
+    def record_word(self, job, word, key, filenames, transient_error=None):
+        """Write the outcome of a word's fetch to its notes and to the cache."""
+        cache_manager = self.cache_manager
+
+        ########################
+        ### Update Anki Cards
+        ########################
+
+        if not transient_error:
+            self.update_notes(job, word, filenames)
+
+        ########################
+        ### Update Cache
+        ########################
+
+        self.attempted.add(key)
+        cache_manager.set_last_attempt(key)
+        if filenames:
+            cache_manager.set_pronunciations(key, filenames)
+            if cache_manager.in_failures(key):
+                cache_manager.set_unfailed(key)
+        elif transient_error:
+            cache_manager.increment_fetch_failure(key, transient_error, transient=True)
+        else:
+            cache_manager.increment_fetch_failure(
+                key, cache_manager.get_204_error_string()
+            )
+
+    def finish_audio(self, wait=False):
+        """
+        Store the words whose recordings have been post-processed, or all
+        pending words if `wait`.
+
+        Returns:
+            int: The number of words finished.
+        """
+        still_pending = []
+        finished = 0
+        for job, word, key, items, pending in self.pending_audio:
+            if not wait and not self.audio_processor.is_done(pending):
+                still_pending.append((job, word, key, items, pending))
+                continue
+            finished += 1
+            filenames = self.store_media(self.audio_processor.collect(pending))
+            if not filenames and self.can_spool():
+                self.spool_items(job, word, key, items)
+                continue
+            self.record_word(
+                job,
+                word,
+                key,
+                filenames,
+                None if filenames else "Failed to store media files.",
+            )
+        self.pending_audio = still_pending
+        return finished
+
+    def rebuild_from_raw(self, jobs):
+        """
+        Rebuild pronunciations offline from the raw response cache, with the
+        current filename scheme and selection: store the media, replace the
+        cached sound refs and update the notes, without any Forvo API request.
+        Words whose refs are unchanged are skipped, and recordings already in
+        Anki, under their new name or an old one, are not downloaded again.
+
+        Returns:
+            int: The number of words rebuilt.
+        """
+        if not self.response_cache:
+            return 0
+
+        cache_manager = self.cache_manager
+        media_files = None
+        rebuilt = set()  # keys, so jobs sharing a word store it once
+        for job in jobs:
+            for word in job.notes_by_word:
+                key = cache_manager.key(word, job.language)
+                if key in rebuilt:
+                    continue
+                raw = self.response_cache.get(key)
+                if not raw or not raw.get("items"):
+                    continue
+                surface = job.surface_words.get(word, word)
+                response = self.forvo.response_from_data(
+                    raw, surface, job.language, job.selector
+                )
+                cached = cache_manager.get_pronunciations(key) or []
+                targets = [self.media_filename(item) for item in response["data"]]
+                if [f"sound:{target}" for target in targets] == cached:
+                    continue
+
+                # List Anki's media folder once, and only if a word changed
+                if media_files is None:
+                    media_files = self.anki_file_manager.get_media_file_names()
+                    if media_files is None:
+                        logger.warning("Media files unavailable. Downloading again.")
+                        media_files = set()
+
+                filenames = self.rebuild_media(
+                    response["data"],
+                    targets,
+                    [sound_filename(ref) for ref in cached],
+                    media_files,
+                    self.forvo.filename_prefix(surface, job.language),
+                )
+                if filenames:
+                    rebuilt.add(key)
+                    cache_manager.set_pronunciations(key, filenames)
+                    if cache_manager.in_failures(key):
+                        cache_manager.set_unfailed(key)
+
+        logger.info(f"Rebuilt {len(rebuilt)} words from cached Forvo responses.")
+
+        # Write the rebuilt refs to the notes in batches
+        self.fill_from_cache(jobs)
+        return len(rebuilt)
+
+    def media_filename(self, item):
+        """Name a recording is stored under, once post-processed."""
+        if self.audio_processor:
+            return self.audio_processor.output_filename(item["filename"])
+        return item["filename"]
+
+    def rebuild_media(self, items, targets, old_names, media_files, prefix):
+        """
+        Store a word's rebuilt recordings, reusing what Anki already has: a
+        file already stored under its new name is kept, and one stored under
+        an old name with the same speaker details after the word `prefix` is
+        copied within Anki. Only the rest is downloaded.
+
+        Returns:
+            list: "sound:filename" refs of the files that were stored, in rank order.
+        """
+        old_names = [name for name in old_names if name in media_files]
+        filenames = []
+        for item, target in zip(items, targets):
+            if target in media_files:
+                filenames.append(f"sound:{target}")
+                continue
+            suffix = target[len(prefix) :]
+            source = next((name for name in old_names if name.endswith(suffix)), None)
+            stored = source and self.anki_file_manager.copy_media_file(source, target)
+            if stored:
+                filenames.append(f"sound:{stored}")
+            else:
+                filenames.extend(self.store_items([item]))
+        return filenames
+
+    def prune_extras(self, jobs):
+        """
+        Trim cached pronunciations beyond each job's top_k, update the notes and
+        delete the extra media files that no note in the collection references
+        any more (notes outside these jobs may share the cache). Cached sound
+        refs carry no Forvo metadata, so the first top_k refs are kept; a word
+        shared by several jobs keeps the largest top_k among them.
+
+        Returns:
+            int: The number of media files deleted.
+        """
+        cache_manager = self.cache_manager
+        limits = {}  # key: (top_k, [(job, word)])
+        for job in jobs:
+            if not job.selector or job.selector.top_k is None:
+                continue
+            for word in job.notes_by_word:
+                key = cache_manager.key(word, job.language)
+                top_k, users = limits.get(key, (0, []))
+                limits[key] = (max(top_k, job.selector.top_k), users + [(job, word)])
+
+        deleted = 0
+        for key, (top_k, users) in limits.items():
+            filenames = cache_manager.get_pronunciations(key) or []
+            if len(filenames) <= top_k:
+                continue
+
+            kept, extras = filenames[:top_k], filenames[top_k:]
+            cache_manager.set_pronunciations(key, kept)
+            for job, word in users:
+                self.update_notes(job, word, kept)
+            for extra in extras:
+                filename = sound_filename(extra)
+                note_ids = self.anki_note_card_manager.notes_referencing_media(filename)
+                if note_ids is None:
+                    continue  # Unknown whether it is used; keep it
+                if note_ids:
+                    logger.info(f"Keeping '{filename}': still used by other notes.")
+                    continue
+                if self.anki_file_manager.delete_media_file(filename):
+                    deleted += 1
+
+        logger.info(f"Pruned {deleted} extra pronunciation files.")
+        return deleted
+
+    def process(self, jobs):
+        """
+        Process the candidate words of all jobs, one word per job in turn.
+
+        Returns:
+            bool: False if processing stopped early (request limit or error).
+        """
+        finished = 0
+        try:
+            for job, word in interleave_jobs(jobs):
+
+                # Store the words whose recordings are ready
+                finished += self.finish_audio()
+
+                # Store what was spooled while AnkiConnect was unavailable
+                self.drain_spool(jobs)
+
+                if not self.forvo_breaker.allow():
+                    logger.warning("Forvo is unavailable. Stopping fetches.")
+                    return False
+
+                # Without a spool, fetched recordings would have nowhere to go
+                if self.spool is None and not self.anki_breaker.allow():
+                    logger.warning("AnkiConnect is unavailable. Stopping fetches.")
+                    return False
+
+                # Check request limit
+                # BAIL COMPLETELY if reached
+                # (We do this again here because the request increment after every word.)
+                if self.is_request_limit():
+                    logger.warning(f"Request limit reached. Bailing")
+                    return False
+
+                if not self.process_word(job, word):
+                    return False
+
+        except:
+            logger.exception("Exception")
+            return False
+        finally:
+            # Store the words still being post-processed; words shared with
+            # other jobs reach their notes through the cache fill
+            finished += self.finish_audio(wait=True)
+            if finished:
+                self.fill_from_cache(jobs)
+        return True
+
+    def is_request_limit(self):
+        return self.key_pool.total_remaining() <= 0
+
+    def run(self, jobs):
+        """
+        Returns:
+            bool: False if processing stopped early (request limit or error).
+        """
+        self.prepare(jobs)
+        self.drain_spool(jobs)
+        completed = self.process(jobs)
+        self.drain_spool(jobs)
+        if self.spool is not None and len(self.spool):
+            logger.warning(
+                f"{len(self.spool)} fetched words wait in the spool until AnkiConnect is available."
+            )
+        self.cache_manager.log_negative_cache_stats()
+        self.key_pool.report()
+        # Save the latencies measured since the last write
+        self.cache_manager.persist()
+        return completed
@@ -0,0 +1,161 @@
+import time
+
+from config.logger import logger
+
+# Constants for watch mode
+DEFAULT_POLL_INTERVAL = 10  # Seconds between AnkiConnect polls
+DEFAULT_FLUSH_INTERVAL = 60  # Seconds between cache flushes
+DEFAULT_RESCAN_INTERVAL = 900  # Seconds between checks of every word for due retries
+RECENT_NOTES_FILTER = "(added:1 OR edited:1)"  # Notes added or edited today
+
+
+class Watcher:
+    def __init__(
+        self,
+        pipeline,
+        jobs,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+        flush_interval=DEFAULT_FLUSH_INTERVAL,
+        rescan_interval=DEFAULT_RESCAN_INTERVAL,
+    ) -> None:
+        """
+        Keep the cache and the word-to-note index of `jobs` in memory and fetch
+        pronunciations for notes as they are added or edited in Anki.
+
+        Every `rescan_interval` seconds, and after each daily quota reset, all
+        indexed words are checked again so failed words are retried once due.
+        """
+        self.pipeline = pipeline
+        self.jobs = jobs
+        self.poll_interval = poll_interval
+        self.flush_interval = flush_interval
+        self.rescan_interval = rescan_interval
+        self.last_rescan = time.monotonic()
+        self.last_reset = None  # last_reset of the cache at the previous poll
+        self.note_mods = {}  # noteId: mod time of the version we have indexed
+        self.limit_logged = False
+        self.backlog = False  # whether the last processing stopped early
+
+    def remember_notes(self, notes):
+        for note in notes:
+            self.note_mods[note["noteId"]] = note.get("mod")
+
+    def poll_job(self, job):
+        """
+        Re-index the job's notes that changed since the last poll.
+
+        Returns:
+            list: Words of the changed notes.
+        """
+        anki = self.pipeline.anki_note_card_manager
+        note_ids = anki.note_ids_from_query(f"({job.query}) {RECENT_NOTES_FILTER}")
+        if not note_ids:
+            return []
+
+        changed_words = []
+        for note in anki.notes_from_note_ids(note_ids):
+            if self.note_mods.get(note["noteId"]) == note.get("mod"):
+                continue
+            self.pipeline.unindex_note(job, note["noteId"])
+            word = self.pipeline.index_note(job, note)
+            if word and word not in changed_words:
+                changed_words.append(word)
+
+        return changed_words
+
+    def poll(self):
+        cache_manager = self.pipeline.cache_manager
+
+        # Roll the daily quota at 22:00 UTC
+        cache_manager.reset_request_count_if_new_day()
+        quota_reset = cache_manager.cache.get("last_reset") != self.last_reset
+        self.last_reset = cache_manager.cache.get("last_reset")
+
+        changed_words = {}  # job: words of its changed notes
+        for job in self.jobs:
+            changed_words[job] = self.poll_job(job)
+            if changed_words[job]:
+                logger.info(f"{job}: {len(changed_words[job])} new or edited words.")
+
+        # New notes for words that are already cached need no Forvo request.
+        # This drops cached words whose media is missing, so candidates are
+        # chosen afterwards.
+        self.pipeline.fill_from_cache(self.jobs)
+
+        # Store what was spooled while AnkiConnect was unavailable
+        self.pipeline.drain_spool(self.jobs)
+
+        # Each poll is a fresh attempt at the words it selects
+        self.pipeline.attempted.clear()
+
+        if self.pipeline.is_request_limit():
+            if not self.limit_logged:
+                logger.warning(
+                    f"Request limit reached. Waiting for the reset at {cache_manager.next_reset_time()}."
+                )
+                self.limit_logged = True
+            # Changed notes are picked up with the backlog after the reset
+            if any(changed_words.values()):
+                self.backlog = True
+            return
+
+        self.limit_logged = False
+        # Pick up every word that is due, not only the notes that changed, when
+        # the last run stopped early (request limit or an outage), the quota was
+        # reset, or failed words may have come due for a retry
+        rescan = (
+            self.backlog
+            or quota_reset
+            or time.monotonic() - self.last_rescan >= self.rescan_interval
+        )
+        if rescan:
+            self.last_rescan = time.monotonic()
+        for job in self.jobs:
+            if rescan:
+                self.pipeline.select_candidates(job)
+            else:
+                job.words = [
+                    word
+                    for word in changed_words[job]
+                    if self.pipeline.can_attempt(
+                        cache_manager.key(word, job.language)
+                    )
+                ]
+        self.backlog = not self.pipeline.process(self.jobs)
+
+        for job in self.jobs:
+            self.remember_notes(
+                note for notes in job.notes_by_word.values() for note in notes
+            )
+
+    def run(self):
+        cache_manager = self.pipeline.cache_manager
+
+        # Work through the backlog first, then keep watching for changes
+        self.backlog = not self.pipeline.run(self.jobs)
+        self.last_rescan = time.monotonic()
+        self.last_reset = cache_manager.cache.get("last_reset")
+        for job in self.jobs:
+            self.remember_notes(
+                note for notes in job.notes_by_word.values() for note in notes
+            )
+
+        logger.info(
+            f"Watching for new notes every {self.poll_interval}s. Press Ctrl+C to stop."
+        )
+        last_flush = time.monotonic()
+        try:
+            while True:
+                time.sleep(self.poll_interval)
+                try:
+                    self.poll()
+                except Exception:
+                    logger.exception("Exception while polling AnkiConnect")
+
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    cache_manager.flush()
+                    last_flush = time.monotonic()
+        except KeyboardInterrupt:
+            logger.info("Stopping watch mode.")
+        finally:
+            cache_manager.flush()
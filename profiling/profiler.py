@@ -0,0 +1,171 @@
+import cProfile
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from config.config import BACKUP_DIR
+from config.logger import logger
+
+# Constants for profiling output
+PROFILES_DIR = os.path.join(os.path.dirname(os.path.abspath(BACKUP_DIR)), "profiles")
+TRACEMALLOC_FRAMES = 25  # Stack depth recorded per allocation
+TOP_ALLOCATIONS = 30  # Lines written per memory report
+DEFAULT_SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+
+
+def add_profiling_args(parser):
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the run with cProfile and write run.pstats",
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="Take tracemalloc snapshots at stage boundaries and write memory reports",
+    )
+    parser.add_argument(
+        "--sample",
+        nargs="?",
+        type=float,
+        const=DEFAULT_SAMPLE_INTERVAL,
+        default=None,
+        metavar="INTERVAL",
+        help=f"Sample the main thread's stack every INTERVAL seconds (default: {DEFAULT_SAMPLE_INTERVAL}) and write collapsed stacks",
+    )
+
+
+def profiler_from_args(args):
+    return Profiler(args.profile, args.tracemalloc, args.sample)
+
+
+class SamplingProfiler(threading.Thread):
+    def __init__(self, thread_id, interval) -> None:
+        """
+        Low-overhead profiler: periodically records the stack of one thread.
+        The output uses the collapsed format read by flame graph tools.
+        """
+        super().__init__(name="SamplingProfiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    def __init__(self, cprofile=False, trace_memory=False, sample_interval=None):
+        """
+        Optional profiling of a run. Outputs go to a timestamped directory in
+        PROFILES_DIR, next to the cache backups, so runs can be compared.
+        Does nothing unless at least one kind of profiling is enabled.
+        """
+        self.cprofile = cprofile
+        self.trace_memory = trace_memory
+        self.sample_interval = sample_interval
+        self.output_dir = None
+        self.profile = None
+        self.sampler = None
+        self.snapshot = None
+        self.stages = 0
+
+    @property
+    def enabled(self):
+        return bool(self.cprofile or self.trace_memory or self.sample_interval)
+
+    def start(self):
+        if not self.enabled:
+            return
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.output_dir = os.path.join(PROFILES_DIR, timestamp)
+        os.makedirs(self.output_dir, exist_ok=True)
+        logger.info(f"Writing profiling output to '{self.output_dir}'.")
+
+        if self.trace_memory:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        if self.sample_interval:
+            self.sampler = SamplingProfiler(
+                threading.get_ident(), self.sample_interval
+            )
+            self.sampler.start()
+        if self.cprofile:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def stage(self, name):
+        """
+        Mark a stage boundary: write a tracemalloc snapshot and a report of the
+        top allocations and of the growth since the previous stage.
+        """
+        if not self.trace_memory or not tracemalloc.is_tracing():
+            return
+        # Keep the snapshot's own cost out of the CPU profile
+        if self.profile:
+            self.profile.disable()
+        self.stages += 1
+        prefix = os.path.join(self.output_dir, f"{self.stages:02d}_{name}")
+        snapshot = tracemalloc.take_snapshot()
+        snapshot.dump(f"{prefix}.tracemalloc")
+
+        current, peak = tracemalloc.get_traced_memory()
+        with open(f"{prefix}.txt", "w", encoding="utf-8") as f:
+            f.write(f"Stage: {name}\nCurrent: {current} bytes\nPeak: {peak} bytes\n")
+            f.write("\nTop allocations:\n")
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+            if self.snapshot:
+                f.write("\nGrowth since previous stage:\n")
+                for stat in snapshot.compare_to(self.snapshot, "lineno")[
+                    :TOP_ALLOCATIONS
+                ]:
+                    f.write(f"{stat}\n")
+        self.snapshot = snapshot
+        logger.info(f"Memory at stage '{name}': {current} bytes (peak {peak}).")
+        if self.profile:
+            self.profile.enable()
+
+    def stop(self):
+        if not self.enabled or not self.output_dir:
+            return
+        if self.profile:
+            self.profile.disable()
+            self.profile.dump_stats(os.path.join(self.output_dir, "run.pstats"))
+            self.profile = None
+        if self.sampler:
+            self.sampler.stop()
+            self.sampler.write(os.path.join(self.output_dir, "samples.txt"))
+        if self.trace_memory:
+            self.stage("end")
+            tracemalloc.stop()
+        logger.info(f"Profiling output written to '{self.output_dir}'.")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,224 @@
+import math
+from collections import Counter
+from datetime import datetime, timedelta
+
+from config.logger import logger
+
+# Constants for reports
+RECENT_USAGE_DAYS = 7  # Quota days averaged for the recent usage
+BURN_DOWN_DAYS = 90  # Days the backlog burn-down is projected at most
+
+
+class CacheReport:
+    def __init__(self, cache_manager, api_keys=None) -> None:
+        """
+        Coverage and quota statistics computed in one pass over the cache
+        sections, without AnkiConnect requests or per-word logging. The daily
+        capacity assumes `api_keys` keys, or the keys used most recently.
+        """
+        self.cache_manager = cache_manager
+        self.api_keys = api_keys
+
+    def keys_from_note_pages(self, note_pages, language, field):
+        """
+        Returns:
+            set: Cache keys of the words in `field` of the paged notes.
+        """
+        keys = set()
+        for notes in note_pages:
+            for note in notes:
+                word = note.get("fields", {}).get(field, {}).get("value")
+                key = self.cache_manager.key(word, language) if word else None
+                if key:
+                    keys.add(key)
+        return keys
+
+    def build(self, anki_keys=None):
+        """
+        Args:
+            anki_keys (set): Cache keys of the words on the notes, to count the
+                untried words. Without them, only cached words are counted.
+
+        Returns:
+            dict: Word coverage, failures, retry schedule, pronunciations per
+            word, quota usage and the projected backlog burn-down.
+        """
+        cache_manager = self.cache_manager
+        cache = cache_manager.cache
+        now = datetime.now()
+
+        pronunciations = cache.get("pronunciations", {})
+        failed_words = cache.get("failed_words", {})
+        attempted_words = cache.get("attempted_words", {})
+
+        per_word = Counter(len(filenames) for filenames in pronunciations.values())
+
+        failed_by_attempts = Counter()
+        retry_due_by_date = Counter()
+        retry_due_now = 0
+        transient = 0
+        for word, details in failed_words.items():
+            if word in pronunciations:
+                continue
+            failed_by_attempts[details.get("attempts", 1)] += 1
+            if details.get("transient"):
+                transient += 1
+            last_attempt = cache_manager.parse_attempt_time(details.get("last_attempt"))
+            if details.get("invalidated") or last_attempt is None:
+                retry_due_now += 1
+                continue
+            retry_at = last_attempt + cache_manager.get_retry_interval(word)
+            if retry_at <= now:
+                retry_due_now += 1
+            else:
+                retry_due_by_date[retry_at.date().isoformat()] += 1
+
+        tried = set(pronunciations) | set(failed_words) | set(attempted_words)
+        untried = len(anki_keys - tried) if anki_keys is not None else None
+
+        words = {
+            "tried": len(tried),
+            "with_pronunciations": len(pronunciations),
+            "failed": sum(failed_by_attempts.values()),
+            "transient_failures": transient,
+            "attempted_only": len(
+                set(attempted_words) - set(pronunciations) - set(failed_words)
+            ),
+            "in_anki": len(anki_keys) if anki_keys is not None else None,
+            "untried": untried,
+        }
+
+        stored = sum(count * number for number, count in per_word.items())
+        pronunciations_per_word = {
+            "average": round(stored / len(pronunciations), 2) if pronunciations else 0,
+            "counts": {str(number): per_word[number] for number in sorted(per_word)},
+        }
+
+        quota = self.quota()
+        backlog = retry_due_now + (untried or 0)
+        return {
+            "generated_at": now.strftime("%Y-%m-%d %H:%M:%S"),
+            "words": words,
+            "failed_by_attempts": {
+                str(attempts): failed_by_attempts[attempts]
+                for attempts in sorted(failed_by_attempts)
+            },
+            "retry_due": {
+                "now": retry_due_now,
+                "by_date": dict(sorted(retry_due_by_date.items())),
+            },
+            "pronunciations_per_word": pronunciations_per_word,
+            "quota": quota,
+            "burn_down": self.burn_down(
+                backlog, retry_due_by_date, quota["remaining_today"], quota["daily_capacity"]
+            ),
+        }
+
+    def quota(self):
+        cache_manager = self.cache_manager
+        history = {}  # day: requests
+        key_history = []  # {key_id: requests} of past quota days, oldest first
+        for day, usage in sorted(cache_manager.get_quota_history().items()):
+            history[day] = usage["request_count"]
+            key_history.append(usage.get("api_keys", {}))
+        used_today = cache_manager.cache.get("request_count", 0)
+        key_usage = {
+            key_id: usage.get("request_count", 0)
+            for key_id, usage in cache_manager.cache.get("api_keys", {}).items()
+        }
+
+        # The report never saves, so roll over at 22:00 UTC the way
+        # reset_request_count_if_new_day would if main.py hasn't run since
+        if cache_manager.needs_reset():
+            last_reset = cache_manager.get_last_reset()
+            if last_reset:
+                history[last_reset.date().isoformat()] = used_today
+                key_history.append(key_usage)
+            used_today = 0
+            key_usage = {}
+
+        # Count the keys in use today (or on the last quota day), not every
+        # key ever recorded
+        used_keys = [key_id for key_id, count in key_usage.items() if count]
+        if not used_keys and key_history:
+            used_keys = [key_id for key_id, count in key_history[-1].items() if count]
+        key_count = self.api_keys or max(len(used_keys), 1)
+        daily_capacity = cache_manager.request_limit * key_count
+        recent = [history[day] for day in sorted(history)][-RECENT_USAGE_DAYS:]
+        return {
+            "api_keys": key_count,
+            "daily_capacity": daily_capacity,
+            "used_today": used_today,
+            "remaining_today": max(daily_capacity - used_today, 0),
+            "recent_daily_average": round(sum(recent) / len(recent)) if recent else None,
+            "history": {day: history[day] for day in sorted(history)},
+        }
+
+    def burn_down(self, backlog, retry_due_by_date, remaining_today, daily_capacity):
+        """
+        Project the backlog (words due now, plus failed words as they become due)
+        against the daily quota, one Forvo request per word.
+
+        Returns:
+            dict: The backlog, the days needed to clear it (None if beyond
+            BURN_DOWN_DAYS) and the words left at the end of each day.
+        """
+        today = datetime.now().date()
+        remaining = backlog
+        remaining_by_date = {}
+        days_to_clear = 0 if not backlog else None
+        for day in range(BURN_DOWN_DAYS):
+            if not remaining:
+                break
+            date = (today + timedelta(days=day)).isoformat()
+            if day:
+                remaining += retry_due_by_date.get(date, 0)
+            remaining = max(remaining - (daily_capacity if day else remaining_today), 0)
+            remaining_by_date[date] = remaining
+            if not remaining:
+                days_to_clear = day + 1
+
+        return {
+            "backlog": backlog,
+            "days_to_clear": days_to_clear,
+            "minimum_days": math.ceil(backlog / daily_capacity) if daily_capacity else None,
+            "remaining_by_date": remaining_by_date,
+        }
+
+    def log_report(self, report):
+        words = report["words"]
+        logger.info(f"Cache status at {report['generated_at']}:")
+        logger.info(
+            f"  Words: {words['tried']} tried ({words['with_pronunciations']} with pronunciations, "
+            f"{words['failed']} failed, {words['attempted_only']} only attempted)"
+        )
+        if words["in_anki"] is not None:
+            logger.info(
+                f"  Anki: {words['in_anki']} words on notes, {words['untried']} untried"
+            )
+        logger.info(
+            f"  Failed by attempts: {report['failed_by_attempts']} "
+            f"({words['transient_failures']} transient)"
+        )
+        logger.info(
+            f"  Retries: {report['retry_due']['now']} due now, "
+            f"{sum(report['retry_due']['by_date'].values())} due later"
+        )
+        per_word = report["pronunciations_per_word"]
+        logger.info(
+            f"  Pronunciations per word: {per_word['average']} on average {per_word['counts']}"
+        )
+        quota = report["quota"]
+        logger.info(
+            f"  Quota: {quota['used_today']}/{quota['daily_capacity']} used today "
+            f"({quota['api_keys']} keys), recent daily average {quota['recent_daily_average']}"
+        )
+        burn_down = report["burn_down"]
+        if burn_down["days_to_clear"] is None:
+            logger.warning(
+                f"  Backlog: {burn_down['backlog']} words, not cleared within {BURN_DOWN_DAYS} days"
+            )
+        else:
+            logger.info(
+                f"  Backlog: {burn_down['backlog']} words, cleared in {burn_down['days_to_clear']} days"
+            )
@@ -0,0 +1,69 @@
+import json
+import sqlite3
+import time
+
+from config.logger import logger
+
+# Constants for the Anki spool
+DEFAULT_SPOOL_FILE = "anki_spool.sqlite3"
+
+
+class SpoolManager:
+    def __init__(self, spool_file=DEFAULT_SPOOL_FILE) -> None:
+        """
+        Local buffer for Forvo results that could not be stored in Anki while
+        AnkiConnect was unavailable, keyed like the pronunciation cache. The
+        entries are stored in bulk once AnkiConnect is back, so the requests
+        spent on them are not wasted.
+        """
+        self.spool_file = spool_file
+        self.connection = sqlite3.connect(spool_file, timeout=30)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS spool ("
+                "key TEXT PRIMARY KEY, word TEXT, language TEXT, "
+                "spooled_at REAL, items TEXT)"
+            )
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def __contains__(self, key):
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM spool WHERE key = ?", (key,)
+            ).fetchone()
+            is not None
+        )
+
+    def add(self, key, word, language, items):
+        """
+        Args:
+            items (list): [{"filename": filename, "url": mp3_url}]
+        """
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO spool VALUES (?, ?, ?, ?, ?)",
+                (key, word, language, time.time(), json.dumps(items)),
+            )
+        logger.info(f"Spooled {len(items)} pronunciations for '{word}'.")
+
+    def remove(self, key):
+        with self.connection:
+            self.connection.execute("DELETE FROM spool WHERE key = ?", (key,))
+
+    def entries(self):
+        """
+        Returns:
+            list: {"key", "word", "language", "items"} dicts, oldest first.
+        """
+        rows = self.connection.execute(
+            "SELECT key, word, language, items FROM spool ORDER BY spooled_at"
+        ).fetchall()
+        return [
+            {"key": key, "word": word, "language": language, "items": json.loads(items)}
+            for key, word, language, items in rows
+        ]
+
+    def close(self):
+        self.connection.close()
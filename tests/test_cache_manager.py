@@ -0,0 +1,56 @@
+import json
+
+from cache.cache_manager import CacheManager
+from forvo.api_key_pool import ApiKeyPool, key_id
+
+
+def make_cache(path):
+    return CacheManager(str(path), 500, 30, default_language="ga", autosave=False)
+
+
+def test_change_after_refresh_survives_concurrent_write(tmp_path):
+    cache_file = tmp_path / "cache.json"
+    first = make_cache(cache_file)
+    first.increment_fetch_failure("w", "No pronunciations")
+    first.write_cache()
+    second = make_cache(cache_file)
+
+    # Another process touches the entry; this process merges it in
+    second.set_last_failed_attempt("w")
+    second.write_cache()
+    with first.lock:
+        first.refresh()
+
+    # Another process writes again before this one changes the merged entry
+    second.increment_request_count()
+    second.write_cache()
+    assert first.invalidate_failures(["w"]) == 1
+    first.write_cache()
+
+    assert first.get_failed_words()["w"].get("invalidated")
+    with open(cache_file, encoding="utf-8") as f:
+        assert json.load(f)["failed_words"]["w"].get("invalidated")
+
+
+def test_key_usage_counts_every_process(tmp_path):
+    cache_file = tmp_path / "cache.json"
+    first = make_cache(cache_file)
+    second = make_cache(cache_file)
+    first_pool = ApiKeyPool(["key"], first)
+    second_pool = ApiKeyPool(["key"], second)
+
+    # Reading the remaining budget must not claim the key's entry as a change
+    first_pool.total_remaining()
+    second_pool.total_remaining()
+    for _ in range(3):
+        assert first_pool.acquire()
+        second_pool.total_remaining()
+        assert second_pool.acquire()
+        first_pool.total_remaining()
+    first.write_cache()
+    second.write_cache()
+
+    with open(cache_file, encoding="utf-8") as f:
+        cache = json.load(f)
+    assert cache["request_count"] == 6
+    assert cache["api_keys"][key_id("key")]["request_count"] == 6
@@ -0,0 +1,36 @@
+import html
+import re
+import unicodedata
+
+CASE_FOLD = True  # Treat "Aoine" and "aoine" as the same word by default
+
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+class WordNormalizer:
+    def __init__(self, case_fold=CASE_FOLD) -> None:
+        """
+        Canonicalize Word field values, so that markup, whitespace, Unicode
+        composition and (optionally) case variants share one cache entry and
+        one Forvo request.
+        """
+        self.case_fold = case_fold
+
+    def clean(self, word):
+        """
+        Strip markup and normalize Unicode and whitespace, keeping the case and
+        spelling, e.g. to query Forvo with the word as it appears on the note.
+        """
+        if not word:
+            return ""
+        text = TAG_PATTERN.sub(" ", word)  # Strip HTML such as <b> or <br>
+        text = html.unescape(text)  # &nbsp; &amp; ...
+        text = unicodedata.normalize("NFC", text)
+        return " ".join(text.split())  # Collapse and trim whitespace
+
+    def normalize(self, word):
+        """Canonical form of a word, used for cache keys and to coalesce lookups."""
+        text = self.clean(word)
+        if self.case_fold:
+            text = text.casefold()
+        return text